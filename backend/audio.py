@@ -0,0 +1,324 @@
+import os
+import time
+import base64
+import asyncio
+import numpy as np
+
+# AudioChat captures mono 16-bit PCM at 48 kHz and ships it base64-encoded
+SAMPLE_RATE = 48000
+# Server mixing: one mixed stream per listener instead of N-1 raw streams
+SERVER_MIX_ENABLED = os.getenv("AUDIO_SERVER_MIX", "0") == "1"
+# Length of one mix frame
+MIX_FRAME_MS = 100
+MIX_FRAME_SAMPLES = SAMPLE_RATE * MIX_FRAME_MS // 1000
+# A sender joins the mix once this much audio is buffered (absorbs chunk arrival jitter)
+PREBUFFER_SAMPLES = SAMPLE_RATE * 200 // 1000
+# Oldest audio is dropped past this, bounding mix latency
+MAX_BUFFER_SAMPLES = SAMPLE_RATE
+# Mixer task stops after this long without any buffered audio
+IDLE_STOP_SECONDS = 2.0
+
+# Sender id used for mixed chunks so clients schedule them as a single peer
+MIX_ID = "mix"
+
+# Codecs the relay can decode/encode, in server preference order.
+#   "mulaw" - 8-bit mu-law companding, 2x smaller than pcm16 at the same rate
+#   "pcm16" - raw little-endian Int16 (what older clients send)
+SUPPORTED_CODECS = ["mulaw", "pcm16"]
+# Integer divisors of 48 kHz, so down/up-sampling stays cheap
+SUPPORTED_RATES = [48000, 24000, 16000, 8000]
+# Format assumed for clients that never negotiated
+LEGACY_FORMAT = ("pcm16", SAMPLE_RATE)
+
+MULAW_MU = 255.0
+
+# Voice activity gate: silent chunks are dropped before fan-out / mixing
+VAD_ENABLED = os.getenv("AUDIO_VAD", "1") == "1"
+# Send one "audio_silence" marker (with the noise level) when a speaker goes quiet
+VAD_COMFORT_NOISE = os.getenv("AUDIO_VAD_COMFORT_NOISE", "1") == "1"
+# Energy is measured over short sub-frames so a single word inside a long chunk still counts
+VAD_FRAME_MS = 20
+# Speech = loudest sub-frame this many dB above the sender's noise floor...
+VAD_MARGIN_DB = 9.0
+# ...and above this absolute level (dBFS), so a dead-silent mic never opens the gate
+VAD_MIN_DB = -55.0
+# Keep forwarding this long after the last speech frame so word endings aren't clipped
+VAD_HANGOVER_SECONDS = 0.4
+# Noise floor adaptation: fast towards quieter, slow towards louder
+VAD_FLOOR_FALL = 0.5
+VAD_FLOOR_RISE = 0.05
+VAD_INITIAL_FLOOR_DB = -60.0
+
+
+def negotiate_format(codecs, sample_rate):
+    """Picks the first codec the client offers that we support, and its rate if we support it."""
+    codec = next((c for c in (codecs or []) if c in SUPPORTED_CODECS), LEGACY_FORMAT[0])
+    rate = sample_rate if sample_rate in SUPPORTED_RATES else SAMPLE_RATE
+    return codec, rate
+
+
+def connection_format(data: dict):
+    fmt = data.get("audio_format")
+    return (fmt["codec"], fmt["sample_rate"]) if fmt else LEGACY_FORMAT
+
+
+def mulaw_encode(samples):
+    x = np.clip(samples.astype(np.float32) / 32768.0, -1.0, 1.0)
+    y = np.sign(x) * np.log1p(MULAW_MU * np.abs(x)) / np.log1p(MULAW_MU)
+    return np.round((y + 1.0) * 127.5).astype(np.uint8)
+
+
+def mulaw_decode(codes):
+    y = codes.astype(np.float32) / 127.5 - 1.0
+    x = np.sign(y) * np.expm1(np.abs(y) * np.log1p(MULAW_MU)) / MULAW_MU
+    return np.round(x * 32767.0).astype(np.int16)
+
+
+def resample(samples, src_rate: int, dst_rate: int):
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    if src_rate % dst_rate == 0:
+        # Integer downsample: box filter (average) doubles as a cheap anti-alias filter
+        k = src_rate // dst_rate
+        n = len(samples) // k * k
+        return samples[:n].astype(np.float32).reshape(-1, k).mean(axis=1)
+    n_out = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.arange(n_out) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(samples)), samples.astype(np.float32))
+
+
+def decode_chunk(chunk: str, codec: str = "pcm16"):
+    raw = base64.b64decode(chunk)
+    if codec == "mulaw":
+        return mulaw_decode(np.frombuffer(raw, dtype=np.uint8))
+    return np.frombuffer(raw, dtype="<i2")
+
+
+def encode_chunk(samples, codec: str = "pcm16") -> str:
+    samples = np.clip(np.round(samples), -32768, 32767).astype("<i2")
+    raw = mulaw_encode(samples).tobytes() if codec == "mulaw" else samples.tobytes()
+    return base64.b64encode(raw).decode("ascii")
+
+
+def transcode(chunk: str, src_format, dst_format) -> str:
+    if src_format == dst_format:
+        return chunk
+    samples = resample(decode_chunk(chunk, src_format[0]), src_format[1], dst_format[1])
+    return encode_chunk(samples, dst_format[0])
+
+
+def decode_pcm(chunk: str, fmt=LEGACY_FORMAT):
+    """Decodes a chunk in any supported format to Int16 at the mixer rate."""
+    return resample(decode_chunk(chunk, fmt[0]), fmt[1], SAMPLE_RATE)
+
+
+def encode_pcm(samples, fmt=LEGACY_FORMAT) -> str:
+    return encode_chunk(resample(samples, SAMPLE_RATE, fmt[1]), fmt[0])
+
+
+class SenderBuffer:
+    def __init__(self):
+        self.chunks = []  # list of int16 arrays, oldest first
+        self.size = 0
+        self.playing = False
+
+    def push(self, samples):
+        self.chunks.append(samples)
+        self.size += len(samples)
+        while self.size > MAX_BUFFER_SAMPLES and self.chunks:
+            self.size -= len(self.chunks.pop(0))
+
+    def pull(self, n: int):
+        """Removes up to n samples, zero padded to n."""
+        out = np.zeros(n, dtype=np.float32)
+        filled = 0
+        while filled < n and self.chunks:
+            head = self.chunks[0]
+            take = min(n - filled, len(head))
+            out[filled:filled + take] = head[:take]
+            filled += take
+            if take == len(head):
+                self.chunks.pop(0)
+            else:
+                self.chunks[0] = head[take:]
+        self.size -= filled
+        return out
+
+
+class AudioMixer:
+    """
+    Buffers incoming public audio per sender and, every MIX_FRAME_MS, sends each listener
+    the sum of everyone else (N-1 mix). Listeners who aren't speaking share one encoded mix.
+
+    get_listeners(room_code) -> {connection: connection data (user_id, audio_format)}
+    deliver(room_code, {connection: message}) -> awaitable
+    get_gains(room_code) -> {listener_id: {speaker_id: gain}} for spatial mixing, or None
+    """
+    def __init__(self, get_listeners, deliver, get_gains=None):
+        self.get_listeners = get_listeners
+        self.deliver = deliver
+        self.get_gains = get_gains
+        self.buffers = {}  # {room_code: {user_id: SenderBuffer}}
+        self.tasks = {}  # {room_code: asyncio.Task}
+
+    def push(self, room_code: str, user_id: str, chunk: str, fmt=LEGACY_FORMAT):
+        try:
+            samples = decode_pcm(chunk, fmt)
+        except (ValueError, TypeError):
+            return
+        if len(samples) == 0:
+            return
+        self.buffers.setdefault(room_code, {}).setdefault(user_id, SenderBuffer()).push(samples)
+
+        task = self.tasks.get(room_code)
+        if task is None or task.done():
+            self.tasks[room_code] = asyncio.create_task(self.run(room_code))
+
+    def mix_frame(self, room_code: str):
+        """Returns ({user_id: float32 frame}, summed frame) for senders currently playing."""
+        frames = {}
+        for uid, buf in self.buffers.get(room_code, {}).items():
+            if not buf.playing and buf.size >= PREBUFFER_SAMPLES:
+                buf.playing = True
+            if buf.playing:
+                if buf.size == 0:
+                    buf.playing = False  # ran dry, wait for a fresh prebuffer
+                    continue
+                frames[uid] = buf.pull(MIX_FRAME_SAMPLES)
+
+        if not frames:
+            return frames, None
+        total = np.sum(np.stack(list(frames.values())), axis=0)
+        return frames, total
+
+    async def run(self, room_code: str):
+        next_tick = time.monotonic()
+        idle_since = time.monotonic()
+        while room_code in self.buffers:
+            frames, total = self.mix_frame(room_code)
+
+            if total is not None:
+                idle_since = time.monotonic()
+                gains = self.get_gains(room_code) if self.get_gains else None
+                speakers = list(frames.keys())
+                stacked = np.stack([frames[s] for s in speakers]) if gains is not None else None
+                encoded = {}  # {(speaker or None, format): message}, non-speakers share one mix
+                mixes = {}
+                for connection, data in self.get_listeners(room_code).items():
+                    uid = data.get("user_id")
+                    if gains is not None and uid in gains:
+                        # Spatial mix: weight each speaker by distance (self and far-away speakers get 0)
+                        weights = np.array([gains[uid].get(s, 0.0) for s in speakers], dtype=np.float32)
+                        if not weights.any():
+                            continue
+                        key = (uid, connection_format(data))
+                        mix = weights @ stacked
+                    elif uid in frames and len(frames) == 1:
+                        continue  # only hearing themselves
+                    else:
+                        key = (uid if uid in frames else None, connection_format(data))
+                        mix = None
+                    if key not in encoded:
+                        if mix is None:
+                            mix = total - frames[uid] if key[0] else total
+                        fmt = key[1]
+                        encoded[key] = {
+                            "type": "audio_update",
+                            "id": MIX_ID,
+                            "codec": fmt[0],
+                            "sample_rate": fmt[1],
+                            "chunk": encode_pcm(mix, fmt)
+                        }
+                    mixes[connection] = encoded[key]
+                if mixes:
+                    await self.deliver(room_code, mixes)
+            elif time.monotonic() - idle_since > IDLE_STOP_SECONDS:
+                break
+
+            next_tick += MIX_FRAME_MS / 1000
+            await asyncio.sleep(max(0, next_tick - time.monotonic()))
+
+    def forget(self, room_code: str, user_id: str = None):
+        if user_id is not None:
+            self.buffers.get(room_code, {}).pop(user_id, None)
+            return
+        self.buffers.pop(room_code, None)
+        task = self.tasks.pop(room_code, None)
+        if task and not task.done():
+            task.cancel()
+
+
+class VoiceActivityGate:
+    """
+    Per-sender energy gate with an adaptive noise floor and hangover.
+    check() returns "speech", "hangover" (forward), "end" (first silent chunk) or "silent" (drop).
+    """
+    def __init__(self):
+        self.senders = {}  # {(room_code, user_id): {"floor_db", "last_speech"}}
+        self.counters = {"chunks": 0, "forwarded": 0, "dropped": 0}
+
+    def frame_levels_db(self, samples, sample_rate: int):
+        frame = max(1, sample_rate * VAD_FRAME_MS // 1000)
+        n = len(samples) // frame * frame
+        if n == 0:
+            frames = samples.astype(np.float32).reshape(1, -1)
+        else:
+            frames = samples[:n].astype(np.float32).reshape(-1, frame)
+        rms = np.sqrt(np.mean(np.square(frames / 32768.0), axis=1))
+        return 20 * np.log10(np.maximum(rms, 1e-6))
+
+    def check(self, room_code: str, user_id: str, samples, sample_rate: int, now: float = None):
+        now = time.time() if now is None else now
+        self.counters["chunks"] += 1
+        state = self.senders.setdefault((room_code, user_id), {
+            "floor_db": VAD_INITIAL_FLOOR_DB, "last_speech": None
+        })
+        if len(samples) == 0:
+            self.counters["dropped"] += 1
+            return "silent"
+
+        levels = self.frame_levels_db(samples, sample_rate)
+        peak = float(levels.max())
+        quiet = float(np.percentile(levels, 20))
+
+        threshold = max(state["floor_db"] + VAD_MARGIN_DB, VAD_MIN_DB)
+        is_speech = peak > threshold
+
+        # Track the floor from the quieter sub-frames of every chunk; creep up only slowly while
+        # someone is talking so continuous speech isn't learned as background noise
+        if quiet < state["floor_db"]:
+            rate = VAD_FLOOR_FALL
+        else:
+            rate = VAD_FLOOR_RISE / 10 if is_speech else VAD_FLOOR_RISE
+        state["floor_db"] += rate * (quiet - state["floor_db"])
+
+        if is_speech:
+            state["last_speech"] = now
+            result = "speech"
+        elif state["last_speech"] is not None and now - state["last_speech"] <= VAD_HANGOVER_SECONDS:
+            result = "hangover"
+        elif state["last_speech"] is not None:
+            state["last_speech"] = None
+            result = "end"
+        else:
+            result = "silent"
+
+        self.counters["forwarded" if result in ("speech", "hangover") else "dropped"] += 1
+        return result
+
+    def noise_level_db(self, room_code: str, user_id: str):
+        state = self.senders.get((room_code, user_id))
+        return round(state["floor_db"], 1) if state else VAD_INITIAL_FLOOR_DB
+
+    def stats(self):
+        chunks = self.counters["chunks"]
+        return {
+            **self.counters,
+            "drop_ratio": round(self.counters["dropped"] / chunks, 3) if chunks else 0.0,
+            "tracked_senders": len(self.senders),
+        }
+
+    def forget(self, room_code: str, user_id: str = None):
+        for key in list(self.senders.keys()):
+            if key[0] == room_code and (user_id is None or key[1] == user_id):
+                del self.senders[key]
@@ -0,0 +1,58 @@
+import os
+import asyncio
+
+from log import log
+
+# Control-plane updates (player list, settings, video demand) go out at most once per room per window
+CONTROL_FLUSH_SECONDS = float(os.getenv("CONTROL_FLUSH_SECONDS", "0.05"))
+
+
+class ControlPlaneCoalescer:
+    """
+    Dirty flags per room. mark() records that a kind of state changed; one flush per room per
+    window then sends a single consolidated message per dirty kind, so a burst of N joins costs
+    N marks and one rebuild + broadcast instead of N full broadcasts.
+    flush(room_code, kinds) is awaited with the set of kinds marked since the last flush.
+    """
+    def __init__(self, flush, window=None):
+        self.flush = flush
+        self.window = window or (lambda: CONTROL_FLUSH_SECONDS)
+        self.dirty = {}  # {room_code: set(kind)}
+        self.tasks = {}  # {room_code: task}
+        self.counters = {"marked": 0, "flushes": 0, "messages": 0}
+
+    def mark(self, room_code: str, kind: str):
+        if not room_code:
+            return
+        self.counters["marked"] += 1
+        self.dirty.setdefault(room_code, set()).add(kind)
+        if room_code not in self.tasks:
+            self.tasks[room_code] = asyncio.create_task(self._flush_later(room_code))
+
+    async def _flush_later(self, room_code: str):
+        try:
+            await asyncio.sleep(self.window())
+        finally:
+            self.tasks.pop(room_code, None)
+        kinds = self.dirty.pop(room_code, None)
+        if kinds:
+            self.counters["flushes"] += 1
+            self.counters["messages"] += len(kinds)
+            try:
+                await self.flush(room_code, kinds)
+            except Exception as e:
+                log.error("control_plane_flush_failed", room=room_code, kinds=sorted(kinds), error=repr(e))
+
+    def forget(self, room_code: str):
+        self.dirty.pop(room_code, None)
+        task = self.tasks.pop(room_code, None)
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+
+    def stats(self):
+        marked = self.counters["marked"]
+        return {
+            **self.counters,
+            "pending_rooms": len(self.dirty),
+            "coalescing_ratio": round(marked / self.counters["messages"], 2) if self.counters["messages"] else None,
+        }
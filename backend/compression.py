@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import weakref
+
+from websockets.frames import CONT, TEXT, CTRL_OPCODES
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+
+from log import log
+
+# uvicorn internal (added in 0.35): without it the policy can't be installed and the server
+# runs uvicorn's default protocol with plain permessage-deflate
+try:
+    from uvicorn.protocols.websockets.websockets_sansio_impl import WebSocketsSansIOProtocol
+except ImportError:
+    WebSocketsSansIOProtocol = None
+
+# Text-heavy messages that are always worth compressing
+COMPRESSED_TYPES = {
+    "round_over", "game_over", "new_question", "sync_game_state", "grading_complete",
+    "player_update", "settings_update", "match_found",
+}
+# Media (base64 JPEG / PCM) and high-rate small updates: deflate costs CPU and saves ~nothing
+UNCOMPRESSED_TYPES = {
+    "video_update", "audio_update", "audio_silence", "world_update", "video_demand", "grading_feedback",
+    "grading_score",
+}
+# Any other message is compressed only if at least this big
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+# Per-connection deflate context size: window 2^bits bytes, memLevel 4 -> ~16 KB per context
+# instead of the ~256 KB zlib default
+COMPRESS_WINDOW_BITS = int(os.getenv("COMPRESS_WINDOW_BITS", "11"))
+COMPRESS_MEM_LEVEL = int(os.getenv("COMPRESS_MEM_LEVEL", "4"))
+
+# Outgoing messages start with the "type" key (json.dumps keeps insertion order)
+TYPE_PREFIX = re.compile(rb'^\{"type": ?"([a-z_]+)"')
+
+
+def message_type(data):
+    match = TYPE_PREFIX.match(bytes(data[:48]))
+    return match.group(1).decode() if match else None
+
+
+def should_compress(message_type, size: int):
+    if message_type in COMPRESSED_TYPES:
+        return True
+    if message_type in UNCOMPRESSED_TYPES:
+        return False
+    return size >= COMPRESS_MIN_BYTES
+
+
+def context_bytes(window_bits: int = COMPRESS_WINDOW_BITS, mem_level: int = COMPRESS_MEM_LEVEL):
+    # zlib's documented deflate footprint
+    return (1 << (window_bits + 2)) + (1 << (mem_level + 9))
+
+
+class CompressionStats:
+    def __init__(self):
+        self.by_type = {}  # {message type: counters}
+        self.contexts = weakref.WeakSet()
+
+    def count(self, message_type, raw: int, wire: int, cpu_seconds: float, compressed: bool):
+        key = message_type or "other"
+        counters = self.by_type.get(key)
+        if counters is None:
+            counters = self.by_type[key] = {"messages": 0, "compressed": 0, "raw_bytes": 0, "wire_bytes": 0, "cpu_ms": 0.0}
+        counters["messages"] += 1
+        counters["compressed"] += compressed
+        counters["raw_bytes"] += raw
+        counters["wire_bytes"] += wire
+        counters["cpu_ms"] += cpu_seconds * 1000
+
+    def stats(self):
+        raw = sum(c["raw_bytes"] for c in self.by_type.values())
+        wire = sum(c["wire_bytes"] for c in self.by_type.values())
+        cpu_ms = sum(c["cpu_ms"] for c in self.by_type.values())
+        return {
+            "contexts": len(self.contexts),
+            "context_bytes": len(self.contexts) * context_bytes(),
+            "bytes_saved": raw - wire,
+            "cpu_ms": round(cpu_ms, 1),
+            "by_type": {
+                t: {**c, "cpu_ms": round(c["cpu_ms"], 2),
+                    "ratio": round(c["wire_bytes"] / c["raw_bytes"], 3) if c["raw_bytes"] else None}
+                for t, c in self.by_type.items()
+            }
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class PolicyDeflate(PerMessageDeflate):
+    """
+    permessage-deflate that only compresses messages should_compress() picks. RFC 7692 allows
+    uncompressed messages on a deflate connection (RSV1 unset), and with context takeover the
+    skipped ones simply never touch the shared compressor.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compressing = False  # decision for the message whose frames are being sent
+        self.current_type = None
+        compression_stats.contexts.add(self)
+
+    def encode(self, frame):
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        if frame.opcode is not CONT:
+            self.current_type = message_type(frame.data) if frame.opcode is TEXT else None
+            self.compressing = frame.opcode is TEXT and should_compress(self.current_type, len(frame.data))
+        if not self.compressing:
+            compression_stats.count(self.current_type, len(frame.data), len(frame.data), 0.0, False)
+            return frame
+        started = time.perf_counter()
+        encoded = super().encode(frame)
+        compression_stats.count(self.current_type, len(frame.data), len(encoded.data),
+                                time.perf_counter() - started, True)
+        return encoded
+
+
+class PolicyDeflateFactory(ServerPerMessageDeflateFactory):
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, PolicyDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+        )
+
+
+if WebSocketsSansIOProtocol is not None:
+    class PolicyWebSocketProtocol(WebSocketsSansIOProtocol):
+        """
+        uvicorn's default websockets protocol with the per-message-type deflate policy.
+        Run with: python main.py, or uvicorn main:app --ws compression:PolicyWebSocketProtocol
+        """
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if self.config.ws_per_message_deflate:
+                self.conn.available_extensions = [
+                    PolicyDeflateFactory(
+                        server_max_window_bits=COMPRESS_WINDOW_BITS,
+                        client_max_window_bits=COMPRESS_WINDOW_BITS,
+                        compress_settings={"memLevel": COMPRESS_MEM_LEVEL},
+                    )
+                ]
+else:
+    from uvicorn.protocols.websockets.auto import AutoWebSocketsProtocol
+
+    log.warning("compression_policy_unavailable", fallback=getattr(AutoWebSocketsProtocol, "__name__", None))
+    PolicyWebSocketProtocol = AutoWebSocketsProtocol
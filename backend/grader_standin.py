@@ -0,0 +1,158 @@
+"""
+Local OpenAI-compatible stand-in for the grader, for measuring grading throughput and tail
+latency without network access or an API key.
+
+    uvicorn grader_standin:app --port 8100
+    GRADER_BASE_URL=http://127.0.0.1:8100/v1 uvicorn main:app
+
+    # or drive the grading path directly against it:
+    GRADER_BASE_URL=http://127.0.0.1:8100/v1 python grader_standin.py --requests 500 --concurrency 50
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Time to the full reply (or the first chunk when streaming): log-normal around the median,
+# SIGMA controls the tail (0.5 puts p99 at ~3x the median)
+STANDIN_LATENCY_MS = float(os.getenv("STANDIN_LATENCY_MS", "800"))
+STANDIN_LATENCY_SIGMA = float(os.getenv("STANDIN_LATENCY_SIGMA", "0.5"))
+# Fractions of requests answered with 500 / 429
+STANDIN_ERROR_RATE = float(os.getenv("STANDIN_ERROR_RATE", "0.0"))
+STANDIN_RATE_LIMIT_RATE = float(os.getenv("STANDIN_RATE_LIMIT_RATE", "0.0"))
+# Streaming pace once the first chunk is out
+STANDIN_TOKENS_PER_SECOND = float(os.getenv("STANDIN_TOKENS_PER_SECOND", "80"))
+
+FEEDBACK_WORDS = (
+    "Clear structure with a concrete situation and task. The actions are specific, but the result "
+    "would be stronger with a measurable outcome. Consider trimming the background and spending "
+    "more time on what you personally did and what you learned."
+).split()
+
+app = FastAPI()
+counters = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0}
+
+
+def sample_latency():
+    return STANDIN_LATENCY_MS / 1000 * random.lognormvariate(0, STANDIN_LATENCY_SIGMA)
+
+
+def fake_reply():
+    words = random.randint(20, len(FEEDBACK_WORDS))
+    return json.dumps({"score": random.randint(40, 95), "feedback": " ".join(FEEDBACK_WORDS[:words])})
+
+
+def completion(model: str, content: str):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def chunk(completion_id: str, model: str, delta: dict, finish_reason=None):
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+async def stream_reply(model: str, content: str):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+    # ~4 characters per token
+    for start in range(0, len(content), 4):
+        await asyncio.sleep(1 / STANDIN_TOKENS_PER_SECOND)
+        yield chunk(completion_id, model, {"content": content[start:start + 4]})
+    yield chunk(completion_id, model, {}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "standin")
+    counters["requests"] += 1
+    await asyncio.sleep(sample_latency())
+
+    roll = random.random()
+    if roll < STANDIN_ERROR_RATE:
+        counters["errors"] += 1
+        return JSONResponse({"error": {"message": "stand-in server error", "type": "server_error"}}, status_code=500)
+    if roll < STANDIN_ERROR_RATE + STANDIN_RATE_LIMIT_RATE:
+        counters["rate_limited"] += 1
+        return JSONResponse({"error": {"message": "stand-in rate limit", "type": "rate_limit_error"}},
+                            status_code=429, headers={"retry-after": "1"})
+
+    if body.get("stream"):
+        counters["streamed"] += 1
+        return StreamingResponse(stream_reply(model, fake_reply()), media_type="text/event-stream")
+    return completion(model, fake_reply())
+
+
+@app.get("/stats")
+def stats():
+    return counters
+
+
+async def bench(requests: int, concurrency: int, stream: bool):
+    import grading
+    import graders
+
+    question = {"type": "behavioral", "prompt": "Tell me about a time you disagreed with a teammate."}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def noop(_):
+        pass
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            if stream:
+                result = await grading.grade_submission_stream("I led the fix...", question, noop, noop)
+            else:
+                result = await grading.grade_submission("I led the fix...", question)
+            latencies.append((time.perf_counter() - started) * 1000)
+            failures += result.get("score") == 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    await graders.close()
+
+    ms = sorted(latencies)
+    print(json.dumps({
+        "requests": requests,
+        "concurrency": concurrency,
+        "failed": failures,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(ms[len(ms) // 2]),
+        "p95_ms": round(ms[int(len(ms) * 0.95)]),
+        "p99_ms": round(ms[int(len(ms) * 0.99)]),
+        "max_ms": round(ms[-1]),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade synthetic submissions against GRADER_BASE_URL")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.concurrency, args.stream))
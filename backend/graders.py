@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+import importlib.util
+from abc import ABC, abstractmethod
+from collections import deque
+import dotenv
+
+from log import log
+
+# Settings below come from .env as well (grading imports this module before its own load_dotenv)
+dotenv.load_dotenv()
+
+# Which GRADER_BACKENDS entry grades submissions
+GRADER_BACKEND = os.getenv("GRADER_BACKEND", "openai")
+# OpenAI-compatible endpoint (point at grader_standin.py for offline load tests)
+GRADER_BASE_URL = os.getenv("GRADER_BASE_URL") or None
+# Default model, and per-question-type overrides as "technical=gpt-4o,behavioral=gpt-4o-mini"
+GRADER_MODEL = os.getenv("GRADER_MODEL", "gpt-4o-mini")
+GRADER_MODELS = {
+    question_type.strip(): model.strip()
+    for question_type, model in (
+        pair.split("=", 1) for pair in os.getenv("GRADER_MODELS", "").split(",") if "=" in pair
+    )
+    if question_type.strip() and model.strip()
+}
+# Connection pool: one grading round fans out one request per player
+GRADER_MAX_CONNECTIONS = int(os.getenv("GRADER_MAX_CONNECTIONS", "100"))
+GRADER_KEEPALIVE_CONNECTIONS = int(os.getenv("GRADER_KEEPALIVE_CONNECTIONS", "20"))
+GRADER_KEEPALIVE_SECONDS = float(os.getenv("GRADER_KEEPALIVE_SECONDS", "60"))
+# Per-request timeout (the SDK default is 10 minutes, longer than a whole round)
+GRADER_TIMEOUT_SECONDS = float(os.getenv("GRADER_TIMEOUT_SECONDS", "30"))
+GRADER_CONNECT_TIMEOUT_SECONDS = 5.0
+GRADER_MAX_RETRIES = int(os.getenv("GRADER_MAX_RETRIES", "1"))
+# HTTP/2 multiplexes concurrent gradings over a few connections; needs the h2 package
+GRADER_HTTP2 = os.getenv("GRADER_HTTP2", "1") == "1"
+# Set up the grader at startup instead of on the first grading (off by default: startup stays fast)
+GRADER_WARMUP = os.getenv("GRADER_WARMUP", "0") == "1"
+
+
+def model_for(question):
+    return GRADER_MODELS.get(question.get("type"), GRADER_MODEL)
+
+
+class GraderBackend(ABC):
+    """
+    A chat-completion service that grades submissions. complete() returns the whole reply text;
+    stream() yields it in pieces. Implementations set themselves up in prepare(), which must not
+    block the event loop.
+    """
+    name = None
+
+    def __init__(self):
+        self.latencies = {}  # {model: deque of request ms}
+        self.counters = {"requests": 0, "errors": 0, "in_flight": 0}
+
+    async def prepare(self):
+        pass
+
+    @abstractmethod
+    async def complete(self, model: str, messages: list):
+        ...
+
+    @abstractmethod
+    def stream(self, model: str, messages: list):
+        ...
+
+    async def close(self):
+        pass
+
+    def _record(self, model: str, started: float, failed: bool):
+        self.counters["in_flight"] -= 1
+        self.counters["errors"] += failed
+        self.latencies.setdefault(model, deque(maxlen=500)).append((time.perf_counter() - started) * 1000)
+
+    def stats(self):
+        by_model = {}
+        for model, samples in self.latencies.items():
+            ms = sorted(samples)
+            by_model[model] = {
+                "p50_ms": round(ms[len(ms) // 2]),
+                "p95_ms": round(ms[int(len(ms) * 0.95)]),
+                "p99_ms": round(ms[int(len(ms) * 0.99)]),
+            }
+        return {"backend": self.name, **self.counters, "models": by_model}
+
+
+class OpenAIGrader(GraderBackend):
+    """OpenAI or any OpenAI-compatible server, over one pooled keep-alive HTTP client."""
+    name = "openai"
+
+    def __init__(self, base_url: str = None):
+        super().__init__()
+        self.base_url = base_url
+        self.client = None
+        self.http2 = False
+        self.lock = asyncio.Lock()
+
+    async def prepare(self):
+        # The SDK takes ~0.5s to import and the client loads TLS certificates: both happen in a
+        # worker thread so the event loop (and the load shedder's lag sampler) never waits on them
+        async with self.lock:
+            if self.client is None:
+                self.client = await asyncio.to_thread(self._build_client)
+                log.info("grader_client_ready", backend=self.name, base_url=self.base_url or "default",
+                         http2=self.http2, max_connections=GRADER_MAX_CONNECTIONS)
+        return self.client
+
+    def _build_client(self):
+        import httpx
+        from openai import AsyncOpenAI
+
+        self.http2 = GRADER_HTTP2 and importlib.util.find_spec("h2") is not None
+        http_client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=GRADER_MAX_CONNECTIONS,
+                max_keepalive_connections=GRADER_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GRADER_KEEPALIVE_SECONDS
+            ),
+            timeout=httpx.Timeout(GRADER_TIMEOUT_SECONDS, connect=GRADER_CONNECT_TIMEOUT_SECONDS)
+        )
+        return AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY") or ("standin" if self.base_url else None),
+            base_url=self.base_url,
+            http_client=http_client,
+            max_retries=GRADER_MAX_RETRIES
+        )
+
+    async def complete(self, model: str, messages: list):
+        client = self.client or await self.prepare()
+        started = time.perf_counter()
+        self.counters["requests"] += 1
+        self.counters["in_flight"] += 1
+        failed = True
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                timeout=GRADER_TIMEOUT_SECONDS
+            )
+            failed = False
+            return response.choices[0].message.content
+        finally:
+            self._record(model, started, failed)
+
+    async def stream(self, model: str, messages: list):
+        client = self.client or await self.prepare()
+        started = time.perf_counter()
+        self.counters["requests"] += 1
+        self.counters["in_flight"] += 1
+        failed = True
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                stream=True,
+                timeout=GRADER_TIMEOUT_SECONDS
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            failed = False
+        finally:
+            self._record(model, started, failed)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def stats(self):
+        return {**super().stats(), "http2": self.http2, "connected": self.client is not None}
+
+
+# name -> factory(base_url)
+GRADER_BACKENDS = {
+    "openai": OpenAIGrader,
+}
+
+_grader = None
+
+
+def get_grader():
+    global _grader
+    if _grader is None:
+        _grader = GRADER_BACKENDS[GRADER_BACKEND](GRADER_BASE_URL)
+    return _grader
+
+
+async def warm():
+    """GRADER_WARMUP=1: sets the grader up in the background at startup, so the first round doesn't pay for it."""
+    try:
+        await get_grader().prepare()
+    except Exception as e:
+        # Not fatal: the first grading retries the setup (and reports the error then)
+        log.warning("grader_warmup_failed", error=repr(e))
+
+
+async def close():
+    if _grader is not None:
+        await _grader.close()
+
+
+def stats():
+    return _grader.stats() if _grader is not None else {"backend": GRADER_BACKEND, "connected": False}
@@ -1,20 +1,27 @@
 import os
+import re
 import json
-from openai import AsyncOpenAI
+import time
+from collections import deque
 import dotenv
-import random
+
+import graders
+from log import log
 
 dotenv.load_dotenv()
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Stream feedback to each player while the model is still writing it
+GRADING_STREAM = os.getenv("GRADING_STREAM", "1") == "1"
+# Streamed feedback text is forwarded at most this often (token-sized sends are wasteful)
+FEEDBACK_FLUSH_SECONDS = 0.1
 
-async def grade_submission(submission_data, question):
-    """
-    Grades the submission using OpenAI API.
-    Expects submission_data to be a string (code or text).
-    Returns a dict with "score" (0-100) and "feedback" (str).
-    """
-    
+JSON_INSTRUCTION = "\nProvide output in JSON format, score first: {'score': int, 'feedback': str}"
+
+# Time from request to first feedback text, for the recent streamed gradings
+first_feedback_ms = deque(maxlen=200)
+
+def build_prompts(submission_data, question):
+    """(system_prompt, user_prompt) for the question's type."""
     q_type = question.get("type", "behavioral")
     q_prompt = question.get("prompt", "Unknown Question")
 
@@ -68,23 +75,169 @@ async def grade_submission(submission_data, question):
         Evaluate this submission for technical accuracy and efficiency.
         """
 
+    return system_prompt, user_prompt
+
+def build_messages(submission_data, question):
+    system_prompt, user_prompt = build_prompts(submission_data, question)
+    return [
+        {"role": "system", "content": system_prompt + JSON_INSTRUCTION},
+        {"role": "user", "content": user_prompt}
+    ]
+
+async def grade_submission(submission_data, question):
+    """
+    Grades the submission with the configured grader backend (see graders.py).
+    Expects submission_data to be a string (code or text).
+    Returns a dict with "score" (0-100) and "feedback" (str).
+    """
+    messages = build_messages(submission_data, question)
+
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt + "\nProvide output in JSON format: {'score': int, 'feedback': str}"},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        content = response.choices[0].message.content
+        content = await graders.get_grader().complete(graders.model_for(question), messages)
         result = json.loads(content)
         return result
 
     except Exception as e:
-        print(f"Error grading submission: {e}")
+        log.error("grading_failed", error=repr(e))
         return {
             "score": 0,
             "feedback": "Error during AI grading. Please check server logs."
-        }
\ No newline at end of file
+        }
+
+SCORE_PATTERN = re.compile(r'"score"\s*:\s*(\d+)\s*[,}\s]')
+FEEDBACK_PATTERN = re.compile(r'"feedback"\s*:\s*"')
+JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"'}
+
+class FeedbackStreamParser:
+    """
+    Incremental reader for the grader's JSON output: the score as soon as its digits are complete,
+    and the feedback string's decoded text as it arrives.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.score = None
+        self.pos = None # Next unread index inside the feedback string
+        self.closed = False
+        self.text = []
+
+    def feed(self, chunk: str):
+        """Returns (score if it just became known else None, new feedback text)."""
+        self.buffer += chunk
+        new_score = None
+        if self.score is None:
+            match = SCORE_PATTERN.search(self.buffer)
+            if match:
+                self.score = new_score = int(match.group(1))
+        if self.pos is None:
+            match = FEEDBACK_PATTERN.search(self.buffer)
+            if match:
+                self.pos = match.end()
+        delta = self._decode() if self.pos is not None and not self.closed else ""
+        if delta:
+            self.text.append(delta)
+        return new_score, delta
+
+    def _decode(self):
+        out = []
+        buf = self.buffer
+        i = self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.closed = True
+                i += 1
+                break
+            if ch == "\\":
+                if i + 1 >= len(buf):
+                    break # Escape split across chunks, wait for the rest
+                if buf[i + 1] == "u":
+                    if i + 6 > len(buf):
+                        break
+                    try:
+                        code = int(buf[i + 2:i + 6], 16)
+                    except ValueError:
+                        i += 6
+                        continue
+                    if 0xD800 <= code < 0xDC00:
+                        # High surrogate (emoji etc. under ensure_ascii): combine with the \uXXXX after it
+                        follows = buf[i + 6:i + 8]
+                        if len(follows) < 2 and "\\u".startswith(follows):
+                            break
+                        if follows == "\\u":
+                            if i + 12 > len(buf):
+                                break
+                            try:
+                                low = int(buf[i + 8:i + 12], 16)
+                            except ValueError:
+                                low = None
+                            if low is not None and 0xDC00 <= low < 0xE000:
+                                out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                                i += 12
+                                continue
+                    if 0xD800 <= code < 0xE000:
+                        out.append("\ufffd") # Unpaired surrogate: not encodable as UTF-8
+                    else:
+                        out.append(chr(code))
+                    i += 6
+                    continue
+                out.append(JSON_ESCAPES.get(buf[i + 1], buf[i + 1]))
+                i += 2
+                continue
+            out.append(ch)
+            i += 1
+        self.pos = i
+        return "".join(out)
+
+    def result(self):
+        try:
+            return json.loads(self.buffer)
+        except ValueError:
+            # Truncated output: keep whatever was already shown to the player
+            return {"score": self.score or 0, "feedback": "".join(self.text)}
+
+async def grade_submission_stream(submission_data, question, on_score, on_feedback):
+    """
+    Streaming variant of grade_submission. Awaits on_score(score) as soon as the score is parsed
+    and on_feedback(text) for each batch of feedback text; returns the same dict at the end.
+    """
+    messages = build_messages(submission_data, question)
+    started = time.perf_counter()
+    parser = FeedbackStreamParser()
+    pending = ""
+    last_flush = 0.0
+
+    try:
+        async for text in graders.get_grader().stream(graders.model_for(question), messages):
+            score, delta = parser.feed(text)
+            if score is not None:
+                await on_score(score)
+            pending += delta
+            now = time.perf_counter()
+            if pending and now - last_flush >= FEEDBACK_FLUSH_SECONDS:
+                if last_flush == 0.0:
+                    first_feedback_ms.append((now - started) * 1000)
+                await on_feedback(pending)
+                pending = ""
+                last_flush = now
+        if pending:
+            await on_feedback(pending)
+        return parser.result()
+
+    except Exception as e:
+        log.error("grading_failed", error=repr(e), streamed=True, score_sent=parser.score is not None)
+        if parser.score is not None:
+            # The player already saw this score and part of the feedback; don't contradict it
+            return parser.result()
+        return {
+            "score": 0,
+            "feedback": "Error during AI grading. Please check server logs."
+        }
+
+def stats():
+    waits = sorted(first_feedback_ms)
+    return {
+        "streaming": GRADING_STREAM,
+        "first_feedback_ms_p50": round(waits[len(waits) // 2]) if waits else None,
+        "first_feedback_ms_p95": round(waits[int(len(waits) * 0.95)]) if waits else None,
+        "backend": graders.stats(),
+    }
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+
+from leaderboard import player_key
+from log import log
+
+# SQLite file holding every completed round
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join(os.path.dirname(__file__), "history.db"))
+# Writer flushes when this many rounds are queued...
+HISTORY_BATCH_SIZE = 50
+# ...or this long after the first one arrived
+HISTORY_BATCH_SECONDS = 1.0
+# Rounds beyond this are dropped (and counted) instead of growing memory without bound
+HISTORY_QUEUE_LIMIT = 5000
+HISTORY_MAX_LIMIT = 500
+
+
+class MatchHistory:
+    """
+    Append-only store of finished rounds. record_round() only enqueues; a background task writes
+    batches in one transaction from a worker thread, so round endings never wait on disk.
+    """
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        self.queue = None
+        self.writer_task = None
+        self.counters = {"queued": 0, "written": 0, "dropped": 0, "batches": 0}
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rounds (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    room_code TEXT NOT NULL,
+                    round_num INTEGER NOT NULL,
+                    question_id TEXT,
+                    question_type TEXT,
+                    ended_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS round_submissions (
+                    round_id INTEGER NOT NULL REFERENCES rounds(id),
+                    player_key TEXT NOT NULL,
+                    username TEXT,
+                    content TEXT,
+                    score INTEGER,
+                    feedback TEXT,
+                    grading_ms REAL,
+                    ended_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_rounds_question ON rounds(question_id, ended_at);
+                CREATE INDEX IF NOT EXISTS idx_rounds_ended ON rounds(ended_at);
+                CREATE INDEX IF NOT EXISTS idx_subs_player ON round_submissions(player_key, ended_at);
+                CREATE INDEX IF NOT EXISTS idx_subs_round ON round_submissions(round_id);
+                CREATE INDEX IF NOT EXISTS idx_subs_ended ON round_submissions(ended_at);
+            """)
+
+    def record_round(self, room_code: str, round_num: int, question: dict, entries: list):
+        """entries: [{"username", "content", "score", "feedback", "grading_ms"}]"""
+        item = (room_code, round_num, question or {}, entries, time.time())
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            failed = self._write_batch([item])  # no event loop (scripts / tests)
+            self.counters["written"] += 1 - failed
+            self.counters["dropped"] += failed
+            return
+
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=HISTORY_QUEUE_LIMIT)
+        if self.writer_task is None or self.writer_task.done():
+            self.writer_task = asyncio.create_task(self.run_writer())
+
+        try:
+            self.queue.put_nowait(item)
+            self.counters["queued"] += 1
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+
+    async def run_writer(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + HISTORY_BATCH_SECONDS
+            while len(batch) < HISTORY_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                failed = await asyncio.to_thread(self._write_batch, batch)
+                self.counters["written"] += len(batch) - failed
+                self.counters["dropped"] += failed
+                self.counters["batches"] += 1
+            except sqlite3.Error as e:
+                self.counters["dropped"] += len(batch)
+                log.error("history_write_failed", rounds=len(batch), error=repr(e))
+
+    def _write_batch(self, batch):
+        """Writes the batch in one transaction; returns how many rounds had to be dropped."""
+        conn = self._connect()
+        try:
+            try:
+                with conn:
+                    for item in batch:
+                        self._write_round(conn, *item)
+                return 0
+            except (sqlite3.Error, TypeError, ValueError):
+                pass
+            # One bad round must not cost the other rooms their history: retry round by round
+            failed = 0
+            for item in batch:
+                try:
+                    with conn:
+                        self._write_round(conn, *item)
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    failed += 1
+                    log.error("history_round_dropped", room=item[0], round=item[1], error=repr(e))
+            return failed
+        finally:
+            conn.close()
+
+    def _write_round(self, conn, room_code, round_num, question, entries, ended_at):
+        cursor = conn.execute(
+            "INSERT INTO rounds (room_code, round_num, question_id, question_type, ended_at) VALUES (?, ?, ?, ?, ?)",
+            (room_code, round_num, question.get("id"), question.get("type"), ended_at),
+        )
+        conn.executemany(
+            """INSERT INTO round_submissions
+               (round_id, player_key, username, content, score, feedback, grading_ms, ended_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    cursor.lastrowid,
+                    player_key(e.get("username")),
+                    e.get("username"),
+                    e.get("content"),
+                    e.get("score"),
+                    json.dumps(e.get("feedback")),
+                    e.get("grading_ms"),
+                    ended_at,
+                )
+                for e in entries
+            ],
+        )
+
+    def _query(self, sql: str, params: list):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+    async def query(self, player: str = None, question_id: str = None,
+                    since: float = None, until: float = None, limit: int = 50):
+        """Submissions filtered by player / question / time range, newest first."""
+        where, params = [], []
+        if player:
+            where.append("s.player_key = ?")
+            params.append(player_key(player))
+        if question_id:
+            where.append("r.question_id = ?")
+            params.append(question_id)
+        if since is not None:
+            where.append("s.ended_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("s.ended_at <= ?")
+            params.append(until)
+        sql = """
+            SELECT r.room_code, r.round_num, r.question_id, r.question_type,
+                   s.username, s.content, s.score, s.feedback, s.grading_ms, s.ended_at
+            FROM round_submissions s JOIN rounds r ON r.id = s.round_id
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.ended_at DESC LIMIT ?"
+        params.append(max(1, min(HISTORY_MAX_LIMIT, limit)))
+
+        rows = await asyncio.to_thread(self._query, sql, params)
+        for row in rows:
+            row["feedback"] = json.loads(row["feedback"]) if row["feedback"] else None
+        return rows
+
+    async def question_stats(self, since: float = None):
+        """Per-question attempts, average score and grading latency (question difficulty analytics)."""
+        sql = """
+            SELECT r.question_id, r.question_type, COUNT(*) AS attempts,
+                   AVG(s.score) AS avg_score, MIN(s.score) AS min_score, MAX(s.score) AS max_score,
+                   AVG(s.grading_ms) AS avg_grading_ms
+            FROM round_submissions s JOIN rounds r ON r.id = s.round_id
+        """
+        params = []
+        if since is not None:
+            sql += " WHERE s.ended_at >= ?"
+            params.append(since)
+        sql += " GROUP BY r.question_id, r.question_type ORDER BY avg_score ASC"
+        return await asyncio.to_thread(self._query, sql, params)
+
+    def stats(self):
+        return {**self.counters, "backlog": self.queue.qsize() if self.queue else 0}
@@ -0,0 +1,319 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+
+from log import log
+
+# SQLite file backing the global leaderboard
+LEADERBOARD_DB = os.getenv("LEADERBOARD_DB", os.path.join(os.path.dirname(__file__), "leaderboard.db"))
+# Largest top-K the HTTP endpoint serves
+LEADERBOARD_MAX_LIMIT = 100
+
+
+def player_key(username: str):
+    # Guest ids are random per room, so players are identified globally by their name
+    return (username or "").strip().lower()
+
+
+class _Node:
+    __slots__ = ("value", "forward", "span")
+
+    def __init__(self, value, level: int):
+        self.value = value
+        self.forward = [None] * level
+        self.span = [0] * level
+
+
+class IndexableSkipList:
+    """
+    Sorted multiset with O(log n) insert / remove / rank and O(log n + k) range reads.
+    Each forward link stores its span (how many nodes it skips) so positions can be computed.
+    """
+    MAX_LEVEL = 32
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_LEVEL)
+        self.level = 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < 0.25:
+            level += 1
+        return level
+
+    def insert(self, value):
+        update = [None] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        x = self.head
+        for i in reversed(range(self.level)):
+            rank[i] = 0 if i == self.level - 1 else rank[i + 1]
+            while x.forward[i] is not None and x.forward[i].value < value:
+                rank[i] += x.span[i]
+                x = x.forward[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                rank[i] = 0
+                update[i] = self.head
+                self.head.span[i] = self.size
+            self.level = level
+
+        node = _Node(value, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+        self.size += 1
+
+    def remove(self, value):
+        update = [None] * self.MAX_LEVEL
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.forward[i] is not None and x.forward[i].value < value:
+                x = x.forward[i]
+            update[i] = x
+
+        x = x.forward[0]
+        if x is None or x.value != value:
+            return False
+        for i in range(self.level):
+            if update[i].forward[i] is x:
+                update[i].span[i] += x.span[i] - 1
+                update[i].forward[i] = x.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+        self.size -= 1
+        return True
+
+    def rank(self, value):
+        """0-based position of value, or None if absent."""
+        traversed = 0
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.forward[i] is not None and x.forward[i].value <= value:
+                traversed += x.span[i]
+                x = x.forward[i]
+            if x is not self.head and x.value == value:
+                return traversed - 1
+        return None
+
+    def slice(self, start: int, count: int):
+        """Up to `count` values from 0-based position `start`."""
+        if start >= self.size or count <= 0:
+            return []
+        traversed = 0
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.forward[i] is not None and traversed + x.span[i] <= start + 1:
+                traversed += x.span[i]
+                x = x.forward[i]
+        out = []
+        while x is not None and len(out) < count:
+            out.append(x.value)
+            x = x.forward[0]
+        return out
+
+
+class GlobalLeaderboard:
+    """
+    Cumulative scores across all rooms. SQLite (WAL) is the durable copy; an indexable skip list
+    ordered by (-score, key) answers top-K and rank queries without touching the database.
+    Rounds are written as increments (another process, e.g. one draining during a migration, may
+    share the file), by a single writer task over one connection; each write reads the totals
+    back and the in-memory entries are refreshed from them plus whatever is still unwritten.
+    """
+    def __init__(self, path: str = LEADERBOARD_DB):
+        self.path = path
+        self.index = IndexableSkipList()
+        self.entries = {}  # {key: {"username", "score", "rounds", "best"}}
+        self.unwritten = {}  # {key: [score, rounds]} recorded in memory, not yet committed
+        self.version = 0  # bumped on every update, used to invalidate cached responses
+        self.cache = {}  # {limit: (version, response)}
+        self.queue = None
+        self.writer_task = None
+        self.conn = None
+        self._init_db()
+        self._load()
+
+    def _connect(self):
+        # Used from the writer's worker thread as well; only one write runs at a time
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        self.conn = self._connect()
+        with self.conn as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leaderboard (
+                    player_key TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    total_score INTEGER NOT NULL,
+                    rounds_played INTEGER NOT NULL,
+                    best_round INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _load(self):
+        with self.conn as conn:
+            rows = conn.execute(
+                "SELECT player_key, username, total_score, rounds_played, best_round FROM leaderboard"
+            ).fetchall()
+        for key, username, score, rounds, best in rows:
+            self.entries[key] = {"username": username, "score": score, "rounds": rounds, "best": best}
+            self.index.insert((-score, key))
+
+    def _write(self, rows):
+        """rows: [(key, username, score, rounds, best, updated_at)] increments. Returns the new totals."""
+        with self.conn as conn:
+            conn.executemany("""
+                INSERT INTO leaderboard (player_key, username, total_score, rounds_played, best_round, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(player_key) DO UPDATE SET
+                    username = excluded.username,
+                    total_score = total_score + excluded.total_score,
+                    rounds_played = rounds_played + excluded.rounds_played,
+                    best_round = MAX(best_round, excluded.best_round),
+                    updated_at = excluded.updated_at
+            """, rows)
+            keys = [row[0] for row in rows]
+            return conn.execute(
+                f"SELECT player_key, username, total_score, rounds_played, best_round FROM leaderboard "
+                f"WHERE player_key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+
+    def _applied(self, rows, totals):
+        # Committed totals (including other processes' rounds) plus what this process hasn't written yet
+        for key, _, score, rounds, _, _ in rows:
+            pending = self.unwritten.get(key)
+            if pending:
+                pending[0] -= score
+                pending[1] -= rounds
+                if not pending[1]:
+                    del self.unwritten[key]
+        changed = False
+        for key, username, score, rounds, best in totals:
+            pending = self.unwritten.get(key, (0, 0))
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            score, rounds, best = score + pending[0], rounds + pending[1], max(best, entry["best"])
+            if (entry["score"], entry["rounds"], entry["best"]) == (score, rounds, best):
+                continue
+            self.index.remove((-entry["score"], key))
+            entry.update({"score": score, "rounds": rounds, "best": best})
+            self.index.insert((-score, key))
+            changed = True
+        if changed:
+            self.version += 1
+
+    def record_round(self, results):
+        """results: [(username, score)] from one finished round. Updates memory now, disk in a thread."""
+        now = time.time()
+        rows = []
+        for username, score in results:
+            key = player_key(username)
+            if not key or score is None:
+                continue
+            score = int(score)
+            entry = self.entries.get(key)
+            if entry:
+                self.index.remove((-entry["score"], key))
+            else:
+                entry = self.entries[key] = {"username": username, "score": 0, "rounds": 0, "best": 0}
+            entry["username"] = username
+            entry["score"] += score
+            entry["rounds"] += 1
+            entry["best"] = max(entry["best"], score)
+            self.index.insert((-entry["score"], key))
+            pending = self.unwritten.setdefault(key, [0, 0])
+            pending[0] += score
+            pending[1] += 1
+            rows.append((key, username, score, 1, score, now))
+
+        if rows:
+            self.version += 1
+            self._persist(rows)
+
+    def _persist(self, rows):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._applied(rows, self._write(rows))  # no event loop (scripts / tests)
+            return
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        if self.writer_task is None or self.writer_task.done():
+            self.writer_task = asyncio.create_task(self.run_writer())
+        self.queue.put_nowait(rows)
+
+    async def run_writer(self):
+        while True:
+            # Everything queued so far goes out in one transaction, one summed increment per player
+            merged = {}
+            batches = [await self.queue.get()]
+            while not self.queue.empty():
+                batches.append(self.queue.get_nowait())
+            for rows in batches:
+                for key, username, score, rounds, best, updated_at in rows:
+                    row = merged.get(key)
+                    if row:
+                        score, rounds, best = row[2] + score, row[3] + rounds, max(row[4], best)
+                    merged[key] = (key, username, score, rounds, best, updated_at)
+            rows = list(merged.values())
+            try:
+                self._applied(rows, await asyncio.to_thread(self._write, rows))
+            except sqlite3.Error as e:
+                log.error("leaderboard_write_failed", players=len(rows), error=repr(e))
+
+    def _row(self, position: int, key: str):
+        entry = self.entries[key]
+        return {
+            "rank": position + 1,
+            "username": entry["username"],
+            "score": entry["score"],
+            "rounds_played": entry["rounds"],
+            "best_round": entry["best"],
+        }
+
+    def top(self, limit: int = 10):
+        limit = max(1, min(LEADERBOARD_MAX_LIMIT, limit))
+        cached = self.cache.get(limit)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        response = [self._row(i, key) for i, (_, key) in enumerate(self.index.slice(0, limit))]
+        self.cache[limit] = (self.version, response)
+        return response
+
+    def rank_of(self, username: str):
+        key = player_key(username)
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        return self._row(self.index.rank((-entry["score"], key)), key)
+
+    def average_score(self, username: str):
+        """Mean score per round played, or None for players with no history."""
+        entry = self.entries.get(player_key(username))
+        if not entry or not entry["rounds"]:
+            return None
+        return entry["score"] / entry["rounds"]
+
+    def stats(self):
+        return {"players": len(self.entries), "version": self.version,
+                "pending_writes": self.queue.qsize() if self.queue else 0}
@@ -0,0 +1,37 @@
+import os
+import json
+import time
+
+# Physics loop parks when no keys are held; it re-checks for non-input changes this often
+HIBERNATE_POLL_SECONDS = 1.0
+# Rooms nobody ever connected to (or everyone left without a held seat) are reaped after this
+ROOM_UNCLAIMED_TTL = float(os.getenv("ROOM_UNCLAIMED_TTL", "60"))
+# Rooms with no messages at all for this long are closed
+ROOM_IDLE_TTL = float(os.getenv("ROOM_IDLE_TTL", "1800"))
+# How often the reaper runs
+REAP_INTERVAL_SECONDS = 15.0
+# Hard cap on rooms per process
+MAX_ROOMS = int(os.getenv("MAX_ROOMS", "500"))
+
+# Rough fixed overhead of a Game + its PlayerStates beyond the serialized state
+ROOM_BASE_BYTES = 4096
+PLAYER_BASE_BYTES = 1024
+
+
+def estimate_room_bytes(game):
+    """Approximate memory held by a room: its serialized state plus fixed per-object overhead."""
+    try:
+        state_bytes = len(json.dumps(game.to_dict(), default=str))
+    except (TypeError, ValueError):
+        state_bytes = 0
+    return ROOM_BASE_BYTES + PLAYER_BASE_BYTES * len(game.players) + state_bytes
+
+
+def reap_reason(game, has_connections: bool, has_held_seats: bool, now: float = None):
+    """Why a room should be closed ("unclaimed" / "idle"), or None to keep it."""
+    now = time.time() if now is None else now
+    if not has_connections and not has_held_seats and now - game.created_at > ROOM_UNCLAIMED_TTL:
+        return "unclaimed"
+    if now - game.last_activity > ROOM_IDLE_TTL:
+        return "idle"
+    return None
@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+from log import log
+
+# The sampler sleeps this long and treats any oversleep as event-loop lag
+LAG_SAMPLE_SECONDS = 0.1
+# Smoothing for the lag estimate (higher reacts faster)
+LAG_EWMA_ALPHA = 0.3
+# Escalate at most one level per this many seconds...
+LEVEL_UP_SECONDS = 1.0
+# ...and step back down only after lag stayed below the exit threshold this long
+LEVEL_DOWN_SECONDS = 5.0
+# Rooms with at least this many players get world_update at a reduced rate while shedding
+LARGE_ROOM_PLAYERS = int(os.getenv("LOAD_SHED_LARGE_ROOM", "8"))
+# Control-plane broadcasts are coalesced over this window (instead of the normal one) at the top level
+DEFER_SECONDS = 1.0
+
+# (name, enter lag ms, exit lag ms); each level keeps the measures of the levels below it
+SHED_LEVELS = [
+    ("normal", 0, 0),
+    ("world_update_rate", 40, 20),  # large rooms: world_update at half rate
+    ("video_quality", 80, 40),  # video capped to the mid tier, sender fps halved
+    ("held_frames", 150, 80),  # early frames are dropped instead of flushed later
+    ("defer_broadcasts", 300, 150),  # control-plane broadcasts coalesced over 1s; world_update quartered, video low tier
+]
+
+
+class LoadShedder:
+    """
+    Event-loop lag sampler and degradation controller. Steps up through SHED_LEVELS as lag
+    crosses each enter threshold and back down once it recovers; on_change(level) applies
+    the policies that live outside this module (video relay / governor settings).
+    """
+    def __init__(self):
+        self.level = 0
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.changed_at = time.monotonic()
+        self.below_since = None
+        self.on_change = None
+        self.task = None
+        self.transitions = deque(maxlen=20)
+
+    def start(self, on_change):
+        self.on_change = on_change
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(LAG_SAMPLE_SECONDS)
+            lag = max(0.0, time.monotonic() - started - LAG_SAMPLE_SECONDS) * 1000
+            self.lag_ms += LAG_EWMA_ALPHA * (lag - self.lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+            self.update(time.monotonic())
+
+    def update(self, now: float):
+        target = self.level
+        if self.level + 1 < len(SHED_LEVELS) and self.lag_ms >= SHED_LEVELS[self.level + 1][1]:
+            if now - self.changed_at >= LEVEL_UP_SECONDS:
+                target = self.level + 1
+            self.below_since = None
+        elif self.level > 0 and self.lag_ms < SHED_LEVELS[self.level][2]:
+            if self.below_since is None:
+                self.below_since = now
+            elif now - self.below_since >= LEVEL_DOWN_SECONDS:
+                target = self.level - 1
+                self.below_since = None
+        else:
+            self.below_since = None
+
+        if target != self.level:
+            self.set_level(target, now)
+
+    def set_level(self, level: int, now: float = None):
+        previous, self.level = self.level, level
+        self.changed_at = time.monotonic() if now is None else now
+        self.transitions.append({"at": time.time(), "from": SHED_LEVELS[previous][0], "to": SHED_LEVELS[level][0],
+                                 "lag_ms": round(self.lag_ms, 1)})
+        log.warning("load_shed_level", policy=SHED_LEVELS[level][0], previous=SHED_LEVELS[previous][0],
+                    lag_ms=round(self.lag_ms, 1))
+        if self.on_change:
+            self.on_change(level)
+
+    # Policies
+
+    def world_update_every(self, player_count: int):
+        """Send world_update every Nth physics tick."""
+        if self.level < 1 or player_count < LARGE_ROOM_PLAYERS:
+            return 1
+        return 2 if self.level < 4 else 4
+
+    def video_tier_cap(self):
+        if self.level < 2:
+            return None
+        return "mid" if self.level < 4 else "low"
+
+    def video_fps_scale(self):
+        return 1.0 if self.level < 2 else 0.5
+
+    def flush_held_frames(self):
+        return self.level < 3
+
+    def control_window(self, normal: float):
+        """Coalescing window for non-critical control-plane broadcasts."""
+        return DEFER_SECONDS if self.level >= 4 else normal
+
+    def status(self):
+        return {
+            "level": self.level,
+            "policy": SHED_LEVELS[self.level][0],
+            "lag_ms": round(self.lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "transitions": list(self.transitions),
+        }
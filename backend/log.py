@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import threading
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+# Keys of every record; same-named fields are written with a trailing underscore
+RESERVED_KEYS = {"ts", "level", "event", "room", "user"}
+# Minimum level written; adjustable at runtime via /internal/log-level
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+# Records waiting for the writer thread; beyond this they are dropped (and counted)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+
+def _parse_map(raw: str, defaults: dict):
+    # "event=value,event=value" overrides on top of the defaults
+    result = dict(defaults)
+    for part in raw.split(","):
+        if "=" in part:
+            event, value = part.split("=", 1)
+            try:
+                result[event.strip()] = float(value)
+            except ValueError:
+                pass
+    return result
+
+
+# Fraction of debug/info records kept per event (warnings and errors are never sampled)
+SAMPLE_RATES = _parse_map(os.getenv("LOG_SAMPLE", ""), {
+    "settings_vote": 0.25,
+})
+# Max records per second per event; the rest are counted and reported on the next record
+RATE_LIMITS = _parse_map(os.getenv("LOG_RATE_LIMIT", ""), {
+    "client_connected": 50,
+    "client_disconnected": 50,
+    "submission_graded": 20,
+    "settings_vote": 10,
+    "ws_error": 10,
+})
+
+
+class StructuredLogger:
+    """
+    JSON-lines logger for the server. Callers only filter (level / sampling / rate limit) and
+    enqueue; formatting and the blocking write to stdout happen on a background thread.
+    """
+    def __init__(self, stream=None, level: str = LOG_LEVEL):
+        self.stream = stream or sys.stdout
+        self.level = LEVELS.get(level, LEVELS["info"])
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.windows = {}  # {event: [window_start, count, suppressed]}
+        self.counters = {"written": 0, "dropped": 0, "sampled_out": 0, "rate_limited": 0}
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def set_level(self, level: str):
+        if level not in LEVELS:
+            return False
+        self.level = LEVELS[level]
+        return True
+
+    def level_name(self):
+        return next(name for name, value in LEVELS.items() if value == self.level)
+
+    def _rate_check(self, event: str, now: float):
+        """Suppressed count to attach to this record, or None if the record must be dropped."""
+        limit = RATE_LIMITS.get(event)
+        if limit is None:
+            return 0
+        window = self.windows.get(event)
+        if window is None or now - window[0] >= 1.0:
+            suppressed = window[2] if window else 0
+            self.windows[event] = [now, 1, 0]
+            return suppressed
+        if window[1] >= limit:
+            window[2] += 1
+            self.counters["rate_limited"] += 1
+            return None
+        window[1] += 1
+        return 0
+
+    def log(self, level: str, event: str, /, room: str = None, user: str = None, **fields):
+        severity = LEVELS[level]
+        if severity < self.level:
+            return
+        if severity < LEVELS["warning"]:
+            rate = SAMPLE_RATES.get(event, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                self.counters["sampled_out"] += 1
+                return
+        now = time.time()
+        suppressed = self._rate_check(event, now)
+        if suppressed is None:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed
+        try:
+            self.queue.put_nowait((now, level, event, room, user, fields))
+        except queue.Full:
+            self.counters["dropped"] += 1
+
+    def debug(self, event: str, /, **fields):
+        self.log("debug", event, **fields)
+
+    def info(self, event: str, /, **fields):
+        self.log("info", event, **fields)
+
+    def warning(self, event: str, /, **fields):
+        self.log("warning", event, **fields)
+
+    def error(self, event: str, /, **fields):
+        self.log("error", event, **fields)
+
+    def _format(self, record):
+        ts, level, event, room, user, fields = record
+        out = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts % 1 * 1000):03d}Z",
+            "level": level,
+            "event": event,
+        }
+        if room is not None:
+            out["room"] = room
+        if user is not None:
+            out["user"] = user
+        for key, value in fields.items():
+            # A field can't clobber the record's own keys (e.g. level=, event=)
+            out[key + "_" if key in RESERVED_KEYS else key] = value
+        return json.dumps(out, default=str)
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            lines = [self._format(record)]
+            # Drain whatever else is queued so bursts become one write + flush
+            while len(lines) < 256:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    self._write(lines)
+                    return
+                lines.append(self._format(record))
+            self._write(lines)
+
+    def _write(self, lines):
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self.counters["written"] += len(lines)
+        except (OSError, ValueError):
+            self.counters["dropped"] += len(lines)
+
+    def close(self):
+        if self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=1)
+            except queue.Full:
+                return
+            self.thread.join(timeout=2)
+
+    def stats(self):
+        return {**self.counters, "level": self.level_name(), "backlog": self.queue.qsize()}
+
+
+log = StructuredLogger()
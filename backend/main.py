@@ -1,8 +1,30 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict
 from questions import get_random_question
-from grading import grade_submission
+import grading
+import graders
+from grading import grade_submission, grade_submission_stream
+from video import VideoRelay, FrameGovernor, LEGACY_TIER, normalize_tier
+from sessions import SessionStore
+from leaderboard import GlobalLeaderboard
+from history import MatchHistory
+from log import log
+from matchmaking import Matchmaker, DEFAULT_RATING
+from ratelimit import ConnectionLimiter, RateLimitStats, COALESCED_TYPES
+from loadshed import LoadShedder
+from spectators import SpectatorHub, SPECTATOR_EVENTS, SPECTATOR_VIDEO_TIER
+from coalesce import ControlPlaneCoalescer, CONTROL_FLUSH_SECONDS
+from compression import compression_stats
+from lifecycle import (
+    HIBERNATE_POLL_SECONDS, REAP_INTERVAL_SECONDS, MAX_ROOMS, estimate_room_bytes, reap_reason
+)
+from migration import DrainController, PEER_WS_URL, authorized, transfer_room, reconnect_delay_ms
+from proximity import SpatialGrid, PROXIMITY_PHASES, AUDIO_RADIUS, VIDEO_RADIUS, audio_gain
+from audio import (
+    AudioMixer, VoiceActivityGate, SERVER_MIX_ENABLED, VAD_ENABLED, VAD_COMFORT_NOISE,
+    negotiate_format, connection_format, transcode, decode_chunk
+)
 
 app = FastAPI()
 
@@ -31,6 +53,7 @@ class PlayerState:
         self.is_moving = False
         self.facing_right = True
         self.is_chatting = False # New state
+        self.chat_partner = None # user_id of coffee chat partner
         self.has_submitted = False # Track submission status
         self.last_update = time.time()
 
@@ -44,31 +67,107 @@ class Game:
         # New Settings
         self.settings = {
             "num_rounds": 3,
-            "round_duration": 60
+            "round_duration": 60,
+            "question_type": None # "technical" / "behavioral" for matchmade rooms, None for any
         }
         self.votes = {} # {user_id: num_rounds}
         self.current_round = 0
         self.cumulative_scores = {} # {user_id: int}
+        self.leaderboard_cache = None # Sorted get_leaderboard() result until scores/players change
         
         # Physics loop task
         self.physics_task = None
         self.round_end_time = None
         self.leader = None # Store user_id of the leader
+        self.grid = SpatialGrid() # Player positions for proximity media routing
+        self.intermission_end_time = None
+        self.grading = False # Batch grading in flight
+        self.grading_latency = {} # {user_id: ms} for the last batch, recorded in match history
+        self.starting = False # Start countdown in progress
+
+        # Lifecycle: physics hibernates when idle, reaper closes unclaimed / idle rooms
+        self.created_at = time.time()
+        self.last_activity = time.time()
+        self.hibernating = False
+        self.wake_event = asyncio.Event()
+        self.force_snapshot = False
+
+    def wake(self, force_snapshot: bool = False):
+        # Resume ticking now (input, join); force_snapshot re-sends positions even if unchanged
+        if force_snapshot:
+            self.force_snapshot = True
+        self.wake_event.set()
+
+    def to_dict(self):
+        # Everything a peer process needs to continue this room (see /internal/rooms/import)
+        return {
+            "state": self.state,
+            "current_question": self.current_question,
+            "submissions": self.submissions,
+            "players": {
+                uid: {
+                    "username": p.username,
+                    "x": p.x,
+                    "y": p.y,
+                    "facing_right": p.facing_right,
+                    "has_submitted": p.has_submitted
+                }
+                for uid, p in self.players.items()
+            },
+            "settings": self.settings,
+            "votes": self.votes,
+            "current_round": self.current_round,
+            "cumulative_scores": self.cumulative_scores,
+            "round_end_time": self.round_end_time,
+            "intermission_end_time": self.intermission_end_time,
+            "leader": self.leader
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        game = cls()
+        for field in ("state", "current_question", "submissions", "settings", "votes",
+                      "current_round", "cumulative_scores", "round_end_time",
+                      "intermission_end_time", "leader"):
+            setattr(game, field, data.get(field, getattr(game, field)))
+        for uid, p in data.get("players", {}).items():
+            player = PlayerState(p["username"], p["x"], p["y"])
+            player.facing_right = p.get("facing_right", True)
+            player.has_submitted = p.get("has_submitted", False)
+            game.players[uid] = player
+        return game
+
+    async def resume_timers(self, room_code: str):
+        # Restart the loops/timers of a room imported mid-game, with the time that was left
+        if self.state in ["LOBBY", "INTERMISSION", "QUESTION"]:
+            await self.start_physics(room_code)
+        if self.state == "QUESTION":
+            remaining = max(0, (self.round_end_time or time.time()) - time.time())
+            asyncio.create_task(self.monitor_round(room_code, self.current_round, remaining))
+        elif self.state in ["INTERMISSION", "RESULTS"]:
+            remaining = max(0, (self.intermission_end_time or time.time() + 60) - time.time())
+            asyncio.create_task(self.handle_intermission(room_code, remaining))
+
     def cleanup(self):
         if self.physics_task and not self.physics_task.done():
             self.physics_task.cancel()
-            print("Physics task cancelled.")
+            log.debug("physics_cancelled")
 
     def handle_input(self, user_id: str, key: str, is_down: bool):
         if user_id not in self.players:
             return # Should exist
         
+        if not isinstance(key, str):
+            return
         key = key.lower()
         if key in self.players[user_id].keys:
             self.players[user_id].keys[key] = is_down
+            self.wake()
 
     async def run_physics_loop(self, room_code: str):
-        print(f"Starting physics loop for {room_code}")
+        log.debug("physics_started", room=room_code)
+        last_snapshot = None
+        tick = 0
         while self.state in ["LOBBY", "INTERMISSION", "QUESTION"]: # Allow physics during lobby and question for early finishers
             # Ideally always if we want movement in lobby too, but let's stick to Intermission request.
             # Actually, user said "Intermission Room", but let's make it robust.
@@ -76,7 +175,11 @@ class Game:
             # For simplicity, let's just check state inside loop and sleep if not active.
             
             start_time = time.time()
+            # Cleared before reading input: a wake that arrives while this tick is broadcasting
+            # stays set, so the hibernation wait below returns immediately instead of missing it
+            self.wake_event.clear()
             
+            any_keys_held = False
             state_snapshot = {}
             for uid, p in self.players.items():
                 speed = 300 # pixels per second
@@ -88,6 +191,7 @@ class Game:
                 if p.keys["s"]: dy += speed * dt
                 if p.keys["a"]: dx -= speed * dt
                 if p.keys["d"]: dx += speed * dt
+                if dx or dy: any_keys_held = True
                 
                 p.x += dx
                 p.y += dy
@@ -118,11 +222,30 @@ class Game:
                     "has_submitted": p.has_submitted
                 }
             
-            if state_snapshot:
+            self.grid.rebuild(self.players)
+
+            # Only send when something changed (or a new client needs the full picture);
+            # large rooms skip ticks while the server sheds load, but the resting position always goes out
+            tick += 1
+            on_send_tick = tick % load_shedder.world_update_every(len(self.players)) == 0 or not any_keys_held
+            if state_snapshot and ((on_send_tick and state_snapshot != last_snapshot) or self.force_snapshot):
+                self.force_snapshot = False
+                last_snapshot = state_snapshot
                 await manager.broadcast_to_room(room_code, {
                     "type": "world_update",
                     "players": state_snapshot
                 })
+                await spectators.world_update(room_code, state_snapshot)
+
+            if not any_keys_held:
+                # Nobody is moving: park until input arrives (or poll slowly for flag changes)
+                self.hibernating = True
+                try:
+                    await asyncio.wait_for(self.wake_event.wait(), timeout=HIBERNATE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self.hibernating = False
+                continue
             
             await asyncio.sleep(0.05) # 20 ticks per second
 
@@ -150,12 +273,12 @@ class Game:
     async def start_round(self, room_code): # Needs room_code to start physics
         self.state = "QUESTION"
         self.current_round += 1
-        self.current_question = get_random_question()
-        self.current_question = get_random_question()
+        self.current_question = get_random_question(self.settings.get("question_type"))
         self.submissions = {}
         # Reset submission status for all players
         for p in self.players.values():
             p.has_submitted = False
+        self.wake() # world_update carries has_submitted
             
         self.round_end_time = time.time() + self.settings["round_duration"]
         
@@ -164,20 +287,21 @@ class Game:
         
         return self.current_question
 
-    async def handle_intermission(self, room_code: str):
+    async def handle_intermission(self, room_code: str, delay: float = 60):
         if room_code not in games: return
         game = games[room_code]
         
         # Start physics for intermission
         game.state = "INTERMISSION" # Strictly set this state
+        game.intermission_end_time = time.time() + delay
         await game.start_physics(room_code)
         
         # Wait for intermission
-        await asyncio.sleep(60) # 1 minute intermission
+        await asyncio.sleep(delay) # 1 minute intermission by default
 
         # RACE CONDITION FIX: check if state changed manually (e.g. via Next Round button)
         if game.state != "INTERMISSION":
-            print(f"Intermission aborted for {room_code}, state is already {game.state}")
+            log.info("intermission_aborted", room=room_code, state=game.state)
             return
         
         # Check if game over
@@ -204,16 +328,17 @@ class Game:
             "total_rounds": game.settings["num_rounds"]
         })
 
-    async def monitor_round(self, room_code: str, round_num: int):
-        duration = self.settings["round_duration"]
+    async def monitor_round(self, room_code: str, round_num: int, duration: float = None):
+        if duration is None:
+            duration = self.settings["round_duration"]
         await asyncio.sleep(duration)
         
             # Check if we are still in the same round and state is QUESTION
         if self.state == "QUESTION" and self.current_round == round_num:
-            print(f"Round {round_num} time expired. Batch grading...")
+            log.info("round_expired", room=room_code, round=round_num)
             
-            await self.perform_batch_grading()
-            results = self.end_round()
+            await self.perform_batch_grading(room_code)
+            results = self.end_round(room_code)
             leaderboard = self.get_leaderboard()
             
             # Broadcast round over
@@ -229,29 +354,52 @@ class Game:
             # Start intermission
             asyncio.create_task(self.handle_intermission(room_code))
 
-    async def perform_batch_grading(self):
-        print("Starting batch grading...")
+    async def timed_grade(self, room_code: str, uid: str, content: str, question: dict):
+        # Per-submission grading latency, kept for match history
+        started = time.perf_counter()
+        if grading.GRADING_STREAM and room_code:
+            # Score and feedback reach the player while the model is still writing
+            async def on_score(score):
+                await manager.send_personal_message(uid, {"type": "grading_score", "score": score}, room_code)
+
+            async def on_feedback(text):
+                await manager.send_personal_message(uid, {"type": "grading_feedback", "delta": text}, room_code)
+
+            result = await grade_submission_stream(content, question, on_score, on_feedback)
+            await manager.send_personal_message(uid, {"type": "grading_complete", "result": result}, room_code)
+        else:
+            result = await grade_submission(content, question)
+        self.grading_latency[uid] = (time.perf_counter() - started) * 1000
+        return result
+
+    async def perform_batch_grading(self, room_code: str = None):
+        log.debug("grading_started", submissions=len(self.submissions))
         tasks = []
         user_ids_to_grade = []
+        self.grading_latency = {}
 
         for uid, data in self.submissions.items():
             # If no score yet, grade it
             if data.get("score") is None:
                 content = data.get("content", "")
-                tasks.append(grade_submission(content, self.current_question))
+                tasks.append(self.timed_grade(room_code, uid, content, self.current_question))
                 user_ids_to_grade.append(uid)
         
         if tasks:
-            results = await asyncio.gather(*tasks)
+            self.grading = True
+            try:
+                results = await asyncio.gather(*tasks)
+            finally:
+                self.grading = False
             
             for uid, result in zip(user_ids_to_grade, results):
                 self.submissions[uid]["score"] = result["score"]
                 self.submissions[uid]["feedback"] = result["feedback"]
-                print(f"Graded {uid}: {result['score']}")
+                log.info("submission_graded", room=room_code, user=uid, score=result["score"], grading_ms=round(self.grading_latency.get(uid, 0), 1))
         
-        print("Batch grading complete.")
+        log.debug("grading_complete", graded=len(user_ids_to_grade))
 
-    def end_round(self):
+    def end_round(self, room_code: str = None):
         self.state = "RESULTS"
         if not self.submissions:
             return []
@@ -260,6 +408,26 @@ class Game:
         for uid, data in self.submissions.items():
             score = data.get("score", 0)
             self.cumulative_scores[uid] = self.cumulative_scores.get(uid, 0) + score
+        self.leaderboard_cache = None
+
+        # Feed the persistent global leaderboard
+        global_leaderboard.record_round([
+            (self.players[uid].username, data.get("score"))
+            for uid, data in self.submissions.items()
+            if uid in self.players and data.get("score") is not None
+        ])
+
+        # Queue the round for match history (written in batches off the event loop)
+        match_history.record_round(room_code, self.current_round, self.current_question, [
+            {
+                "username": self.players[uid].username if uid in self.players else "Unknown",
+                "content": data.get("content"),
+                "score": data.get("score"),
+                "feedback": data.get("feedback"),
+                "grading_ms": self.grading_latency.get(uid)
+            }
+            for uid, data in self.submissions.items()
+        ])
             
         # Return round results sorted by score
         # Need to include usernames? Or let frontend map it? 
@@ -279,23 +447,61 @@ class Game:
         return sorted_results
         
     def get_leaderboard(self):
-        # Return cumulative leaderboard
+        # Return cumulative leaderboard (cached; round_over / game_over / skip paths all ask for it)
+        if self.leaderboard_cache is not None:
+            return self.leaderboard_cache
         lb = []
         for uid, score in self.cumulative_scores.items():
              p_state = self.players.get(uid)
              u_name = p_state.username if p_state else "Unknown"
              lb.append({"user_id": uid, "username": u_name, "score": score})
 
-        return sorted(
+        self.leaderboard_cache = sorted(
             lb,
             key=lambda x: x["score"],
             reverse=True
         )
+        return self.leaderboard_cache
 
 # Global dictionary to store game instances keyed by room_code
 # { "ABCD": Game() }
 games: Dict[str, Game] = {}
 
+# Cross-room leaderboard (SQLite + in-memory rank index)
+global_leaderboard = GlobalLeaderboard()
+
+# Every finished round: submissions, scores, feedback, grading latency
+match_history = MatchHistory()
+
+# Resumable player sessions (resume token + replay buffer)
+sessions = SessionStore()
+
+# Drain mode / live room hand-off to a peer process
+drain = DrainController()
+
+# Solo queue: groups waiting players into rooms by rating and question type
+matchmaker = Matchmaker()
+
+# Per-message-type counters for the per-connection rate limits
+rate_limits = RateLimitStats()
+
+# Event-loop lag monitor; degrades world_update rate / video / broadcasts under overload
+load_shedder = LoadShedder()
+
+# Read-only viewers per room, fed one shared pre-serialized stream
+spectators = SpectatorHub()
+
+# Dirty flags for player list / settings / video demand, flushed once per room per short window
+control_plane = ControlPlaneCoalescer(
+    lambda room_code, kinds: manager.flush_control_plane(room_code, kinds),
+    lambda: load_shedder.control_window(CONTROL_FLUSH_SECONDS)
+)
+
+# Simulcast video routing (per-recipient tier selection)
+video_relay = VideoRelay()
+# Per-sender fps budget and duplicate-frame suppression
+video_governor = FrameGovernor()
+
 class ConnectionManager:
     def __init__(self):
         # Key: WebSocket, Value: dict (player info: user_id, username, room_code)
@@ -305,7 +511,8 @@ class ConnectionManager:
         await websocket.accept()
         # Initial connection doesn't have metadata yet
         self.active_connections[websocket] = {"user_id": None, "username": None, "room_code": None}
-        print(f"Client connected. Total: {len(self.active_connections)}")
+        self.active_connections[websocket]["limiter"] = ConnectionLimiter() # Per-type token buckets
+        log.info("client_connected", total=len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
@@ -313,15 +520,37 @@ class ConnectionManager:
             user_id = data.get("user_id")
             room_code = data.get("room_code")
             del self.active_connections[websocket]
-            print(f"Client {user_id} disconnected from room {room_code}. Total: {len(self.active_connections)}")
+            data["limiter"].cancel()
+            self.remove_spectator(websocket)
+            matchmaker.remove(websocket)
+            log.info("client_disconnected", room=room_code, user=user_id, total=len(self.active_connections))
             return room_code, user_id
         return None, None
 
-    async def send_personal_message(self, user_id: str, message: dict):
+    def seat(self, websocket: WebSocket):
+        # (room_code, user_id, session token) the connection currently plays in
+        data = self.active_connections[websocket]
+        return data.get("room_code"), data.get("user_id"), data.get("session")
+
+    def remove_spectator(self, websocket: WebSocket):
+        room_code = spectators.remove(websocket)
+        if room_code and not spectators.count(room_code):
+            # Last spectator gone: publishers can stop sending the spectator tier
+            control_plane.mark(room_code, "video_demand")
+
+    async def send(self, websocket: WebSocket, message: dict):
+        # Reliable messages are stamped with a seq and buffered for replay on resume
+        data = self.active_connections.get(websocket)
+        if data and data.get("session"):
+            message = sessions.record(data["session"], message)
+        await websocket.send_json(message)
+
+    async def send_personal_message(self, user_id: str, message: dict, room_code: str = None):
+        # Guest ids are only unique within a room, so pass room_code when it is known
         for connection, data in self.active_connections.items():
-            if data.get("user_id") == user_id:
+            if data.get("user_id") == user_id and (room_code is None or data.get("room_code") == room_code):
                 try:
-                    await connection.send_json(message)
+                    await self.send(connection, message)
                 except:
                     pass
                 return
@@ -334,13 +563,63 @@ class ConnectionManager:
         # Iterate over a copy to avoid RuntimeError if connections close during iteration
         for connection, data in list(self.active_connections.items()):
             if data.get("room_code") == room_code:
-                tasks.append(connection.send_json(message))
+                tasks.append(self.send(connection, message))
+        if message.get("type") in SPECTATOR_EVENTS:
+            tasks.append(spectators.publish(room_code, message))
+
+        # Players in their reconnect grace period get it on resume
+        for session in sessions.detached_in_room(room_code):
+            sessions.record(session.token, message)
         
         if tasks:
             # Gather all send tasks; ignore individual failures (disconnects)
             await asyncio.gather(*tasks, return_exceptions=True)
 
+    async def send_to_connections(self, connections: list, message: dict):
+        tasks = [connection.send_json(message) for connection in connections]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def send_each(self, messages: dict):
+        # {websocket: message} - a different message per connection
+        tasks = [connection.send_json(message) for connection, message in messages.items()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def sync_video_demand(self, room_code: str):
+        # Coalesced: recomputed once per room per flush window
+        control_plane.mark(room_code, "video_demand")
+
     async def broadcast_player_list(self, room_code: str):
+        # Coalesced: a join/leave storm becomes one player_update per room per flush window
+        control_plane.mark(room_code, "players")
+
+    async def broadcast_settings(self, room_code: str):
+        control_plane.mark(room_code, "settings")
+
+    async def flush_control_plane(self, room_code: str, kinds: set):
+        if "players" in kinds:
+            await self.send_player_list(room_code)
+        if "settings" in kinds and room_code in games:
+            game = games[room_code]
+            await self.broadcast_to_room(room_code, {
+                "type": "settings_update",
+                "settings": game.settings,
+                "votes": game.votes
+            })
+        if "video_demand" in kinds:
+            await self.send_video_demand(room_code)
+
+    async def send_video_demand(self, room_code: str):
+        # Tell publishers which simulcast tiers someone is actually watching
+        extra_tiers = [SPECTATOR_VIDEO_TIER] if spectators.count(room_code) else []
+        for user_id, tiers in video_relay.compute_demand(room_code, self.active_connections, extra_tiers).items():
+            await self.send_personal_message(user_id, {
+                "type": "video_demand",
+                "tiers": tiers
+            }, room_code)
+
+    async def send_player_list(self, room_code: str):
         if not room_code: return
 
         players_list = []
@@ -354,7 +633,7 @@ class ConnectionManager:
              if not game_instance.leader or game_instance.leader not in active_ids:
                  if active_ids:
                      game_instance.leader = active_ids[0] # First one or random
-                     print(f"New leader for {room_code}: {game_instance.leader}")
+                     log.info("leader_changed", room=room_code, user=game_instance.leader)
                  else:
                      game_instance.leader = None
 
@@ -368,6 +647,15 @@ class ConnectionManager:
                     "username": data["username"],
                     "is_leader": is_leader
                 })
+
+        # Keep players who are reconnecting in the list so clients don't drop their tiles
+        for session in sessions.detached_in_room(room_code):
+            players_list.append({
+                "id": session.user_id,
+                "username": session.username,
+                "is_leader": False,
+                "connected": False
+            })
         
         current_state = game_instance.state if game_instance else "LOBBY"
 
@@ -380,6 +668,108 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+def nearby_players(room_code: str, user_id: str, radius: float):
+    """
+    {user_id: distance} of players near user_id while walking around the map,
+    or None when media should go to the whole room.
+    """
+    game = games.get(room_code)
+    if not game or game.state not in PROXIMITY_PHASES:
+        return None
+    near = game.grid.nearby(user_id, radius)
+    if near is None:
+        return None # No position yet (just joined)
+    p = game.players.get(user_id)
+    if p and p.chat_partner:
+        near[p.chat_partner] = 0.0 # Coffee chat partners always see each other
+    return near
+
+def audio_gains(room_code: str):
+    # {listener_id: {speaker_id: gain}} for the mixer, or None to mix everyone at full volume
+    game = games.get(room_code)
+    if not game or game.state not in PROXIMITY_PHASES:
+        return None
+    gains = {}
+    for uid in game.players:
+        near = nearby_players(room_code, uid, AUDIO_RADIUS)
+        if near is not None:
+            gains[uid] = {other: audio_gain(distance) for other, distance in near.items()}
+    return gains
+
+def video_targets(room_code: str, user_id: str, tier: str):
+    # Nearby recipients subscribed to this tier of the sender
+    near = nearby_players(room_code, user_id, VIDEO_RADIUS)
+    return video_relay.route(room_code, user_id, tier, manager.active_connections, near)
+
+def recipient_key(targets: list):
+    # Identifies a routed target set for the governor (a new socket after a resume counts as new)
+    return frozenset(id(connection) for connection in targets)
+
+async def relay_video_frame(room_code: str, user_id: str, username: str, tier: str, frame_data: str, targets: list):
+    message = {
+        "type": "video_update",
+        "id": user_id,
+        "username": username,
+        "tier": tier,
+        "frame": frame_data
+    }
+    await manager.send_to_connections(targets, message)
+    if tier == SPECTATOR_VIDEO_TIER:
+        await spectators.publish(room_code, message)
+
+def audio_listeners(room_code: str):
+    # Everyone in the room except players in a private coffee chat (they only hear their partner)
+    game = games.get(room_code)
+    listeners = {}
+    for connection, data in manager.active_connections.items():
+        uid = data.get("user_id")
+        if data.get("room_code") != room_code or not uid:
+            continue
+        if game and uid in game.players and game.players[uid].is_chatting:
+            continue
+        listeners[connection] = data
+    return listeners
+
+async def deliver_audio_mix(room_code: str, mixes: dict):
+    await manager.send_each(mixes)
+
+async def relay_audio_chunk(targets: dict, user_id: str, chunk: str, src_format, gains: dict = None):
+    # Transcode once per distinct listener format, not once per listener
+    messages = {}
+    by_format = {}
+    chunks = {}
+    for connection, data in targets.items():
+        fmt = connection_format(data)
+        gain = gains.get(data.get("user_id")) if gains is not None else None
+        key = (fmt, gain)
+        if key not in by_format:
+            if fmt not in chunks:
+                chunks[fmt] = transcode(chunk, src_format, fmt)
+            by_format[key] = {
+                "type": "audio_update",
+                "id": user_id,
+                "codec": fmt[0],
+                "sample_rate": fmt[1],
+                "chunk": chunks[fmt]
+            }
+            if gain is not None:
+                by_format[key]["gain"] = gain # Distance-based volume hint for spatial audio
+        messages[connection] = by_format[key]
+    await manager.send_each(messages)
+
+# Optional server-side N-1 mixing (AUDIO_SERVER_MIX=1)
+audio_mixer = AudioMixer(audio_listeners, deliver_audio_mix, audio_gains)
+# Drops silent chunks before fan-out (AUDIO_VAD=0 disables)
+voice_gate = VoiceActivityGate()
+
+async def flush_video_frame(room_code: str, user_id: str, username: str, tier: str, delay: float):
+    # Send the latest frame held back by the governor once the sender's slot comes up
+    await asyncio.sleep(delay)
+    targets = video_targets(room_code, user_id, tier)
+    frame_data = video_governor.take_pending(room_code, user_id, tier, recipient_key(targets))
+    if frame_data is not None and room_code in games:
+        await relay_video_frame(room_code, user_id, username, tier, frame_data, targets)
+
 @app.get("/")
 async def get():
     all_games = {}
@@ -401,26 +791,353 @@ async def get():
         "message": "Interview Royale Backend Running",
         "active_rooms": len(games),
         "total_connections": len(manager.active_connections),
+        "video": video_governor.stats(),
+        "audio_vad": voice_gate.stats(),
+        "sessions": sessions.stats(),
+        "leaderboard": global_leaderboard.stats(),
+        "history": match_history.stats(),
+        "matchmaking": matchmaker.stats(),
+        "rate_limits": rate_limits.stats(),
+        "grading": grading.stats(),
+        "load_shedding": load_shedder.status(),
+        "spectators": spectators.stats(),
+        "control_plane": control_plane.stats(),
+        "compression": compression_stats.stats(),
+        "log": log.stats(),
+        "rooms": {
+            "count": len(games),
+            "max": MAX_ROOMS,
+            "hibernating": sum(1 for g in games.values() if g.hibernating),
+            "estimated_bytes": sum(estimate_room_bytes(g) for g in games.values())
+        },
         "games": all_games
     }
 
+@app.get("/leaderboard")
+async def get_global_leaderboard(limit: int = 10, username: str = None):
+    # Read-only, served from the in-memory index (top-K responses are cached per version)
+    response = {"top": global_leaderboard.top(limit)}
+    if username:
+        response["me"] = global_leaderboard.rank_of(username)
+    return response
+
+@app.get("/matchmaking")
+async def get_matchmaking_stats():
+    # Queue depth and recent wait times (p50 / p95) for the solo queue
+    return matchmaker.stats()
+
+@app.get("/history")
+async def get_match_history(player: str = None, question_id: str = None,
+                            since: float = None, until: float = None, limit: int = 50):
+    # Read-only; queries run in a worker thread against the history database
+    return {"rounds": await match_history.query(player, question_id, since, until, limit)}
+
+@app.get("/history/questions")
+async def get_question_stats(since: float = None):
+    # Per-question attempts / average score / grading latency, hardest first
+    return {"questions": await match_history.question_stats(since)}
+
+import os
 import string
 import random
 import asyncio
 
+def room_is_safe_to_migrate(room_code: str):
+    # Let short phases finish first: grading in flight, start countdown, a question being answered
+    game = games.get(room_code)
+    if not game:
+        return True
+    return not game.grading and not game.starting and game.state in ["LOBBY", "INTERMISSION", "GAME_OVER"]
+
+async def migrate_room(room_code: str):
+    game = games.get(room_code)
+    if not game:
+        return True
+    payload = {
+        "room_code": room_code,
+        "game": game.to_dict(),
+        "sessions": sessions.export_room(room_code)
+    }
+    if not await transfer_room(payload):
+        log.warning("migration_refused", room=room_code)
+        return False
+
+    # Peer owns the room now: stop it here and point every client at the new owner
+    game.state = "MIGRATED" # Pending timers see a state change and stop
+    game.cleanup()
+    for connection, data in list(manager.active_connections.items()):
+        if data.get("room_code") != room_code:
+            continue
+        try:
+            await connection.send_json({
+                "type": "migrate",
+                "url": PEER_WS_URL,
+                "resume_token": data.get("session"),
+                "reconnect_delay_ms": reconnect_delay_ms()
+            })
+        except Exception:
+            pass
+        data["room_code"] = None
+        data["session"] = None
+
+    # Spectators have no seat to resume: they reconnect to the peer and spectate again
+    discard_room(room_code, {"type": "migrate", "url": PEER_WS_URL, "reconnect_delay_ms": reconnect_delay_ms()})
+    log.info("room_migrated", room=room_code)
+    return True
+
+@app.post("/internal/drain")
+async def start_drain(x_migration_secret: str = Header(default="")):
+    if not authorized(x_migration_secret):
+        raise HTTPException(status_code=403)
+    drain.start(lambda: list(games.keys()), room_is_safe_to_migrate, migrate_room)
+    return drain.status()
+
+@app.post("/internal/log-level")
+async def set_log_level(level: str, x_migration_secret: str = Header(default="")):
+    # Runtime log level (debug / info / warning / error) without a restart
+    if not authorized(x_migration_secret):
+        raise HTTPException(status_code=403)
+    if not log.set_level(level.lower()):
+        raise HTTPException(status_code=400, detail="Unknown log level")
+    log.warning("log_level_changed", new_level=log.level_name())
+    return log.stats()
+
+@app.get("/internal/drain")
+async def drain_status(x_migration_secret: str = Header(default="")):
+    if not authorized(x_migration_secret):
+        raise HTTPException(status_code=403)
+    return {**drain.status(), "rooms_left": len(games)}
+
+@app.post("/internal/rooms/import")
+async def import_room(payload: dict, x_migration_secret: str = Header(default="")):
+    if not authorized(x_migration_secret):
+        raise HTTPException(status_code=403)
+    if drain.draining:
+        raise HTTPException(status_code=503)
+    room_code = payload["room_code"]
+    if room_code in games:
+        raise HTTPException(status_code=409)
+
+    game = Game.from_dict(payload["game"])
+    games[room_code] = game
+    for session_data in payload.get("sessions", []):
+        # Clients resume with their existing tokens; unclaimed seats expire as usual
+        sessions.import_session(room_code, session_data, remove_player)
+    await game.resume_timers(room_code)
+    log.info("room_imported", room=room_code, players=len(game.players), state=game.state)
+    return {"ok": True}
+
+async def send_game_state(websocket: WebSocket, game: Game):
+    # Determine current phase details
+    # Note: We need to send relevant info depending on phase
+    await manager.send(websocket, {
+        "type": "sync_game_state",
+        "phase": game.state, # QUESTION, RESULTS, INTERMISSION
+        "question": game.current_question,
+        "current_round": game.current_round,
+        "total_rounds": game.settings["num_rounds"],
+        "round_end_time": game.round_end_time
+    })
+
+async def remove_player(room_code: str, user_id_removed: str):
+    # Sync game state
+    if room_code in games and user_id_removed:
+         if user_id_removed in games[room_code].players:
+             del games[room_code].players[user_id_removed]
+             games[room_code].leaderboard_cache = None # Their name shows as "Unknown" now
+             games[room_code].wake()
+    video_relay.forget(room_code, user_id_removed)
+    video_governor.forget(room_code, user_id_removed)
+    audio_mixer.forget(room_code, user_id_removed)
+    voice_gate.forget(room_code, user_id_removed)
+    
+    await manager.broadcast_player_list(room_code)
+    await manager.sync_video_demand(room_code)
+    # Check if room is empty (players reconnecting still count)
+    active_ids = [p["user_id"] for p in manager.active_connections.values() if p.get("room_code") == room_code]
+    if not active_ids and not sessions.detached_in_room(room_code) and room_code in games:
+        log.info("room_deleted", room=room_code, reason="empty")
+        discard_room(room_code, {"type": "room_closed", "reason": "empty"})
+
+async def release_seat(room_code: str, user_id: str, token: str):
+    # The seat a connection held before it created/joined/resumed another one: gone for good
+    if token:
+        sessions.discard(token)
+    if room_code:
+        log.info("seat_released", room=room_code, user=user_id)
+        await remove_player(room_code, user_id)
+
+def discard_room(room_code: str, spectator_farewell: dict = None):
+    # Stop a room's tasks and drop every piece of per-room state; spectators get spectator_farewell
+    if room_code in games:
+        games[room_code].cleanup()
+        del games[room_code]
+    sessions.discard_room(room_code)
+    video_relay.forget(room_code)
+    video_governor.forget(room_code)
+    audio_mixer.forget(room_code)
+    voice_gate.forget(room_code)
+    spectators.forget(room_code, spectator_farewell)
+    control_plane.forget(room_code)
+
+async def reap_rooms():
+    # Close rooms nobody claimed and rooms idle past their TTL
+    while True:
+        await asyncio.sleep(REAP_INTERVAL_SECONDS)
+        connected = {d.get("room_code") for d in manager.active_connections.values()}
+        for room_code, game in list(games.items()):
+            reason = reap_reason(game, room_code in connected, bool(sessions.detached_in_room(room_code)))
+            if not reason:
+                continue
+            log.info("room_reaped", room=room_code, reason=reason)
+            await manager.broadcast_to_room(room_code, {"type": "room_closed", "reason": reason})
+            for data in manager.active_connections.values():
+                if data.get("room_code") == room_code:
+                    data["room_code"] = None
+                    data["session"] = None
+            discard_room(room_code)
+
+@app.on_event("startup")
+async def start_reaper():
+    asyncio.create_task(reap_rooms())
+
+def apply_load_shedding(level: int):
+    # Video policies live in the relay / governor; publishers learn the new tier set via video_demand
+    video_relay.tier_cap = load_shedder.video_tier_cap()
+    video_governor.fps_scale = load_shedder.video_fps_scale()
+    video_governor.flush_held = load_shedder.flush_held_frames()
+    for room_code in list(games.keys()):
+        asyncio.create_task(manager.sync_video_demand(room_code))
+
+@app.on_event("startup")
+async def start_load_shedder():
+    load_shedder.start(apply_load_shedding)
+
+@app.on_event("startup")
+async def warm_grader():
+    # Opt-in; otherwise the grader client is built on the first grading
+    if graders.GRADER_WARMUP:
+        asyncio.create_task(graders.warm())
+
+@app.on_event("shutdown")
+async def close_grader():
+    # Only does anything if a grading request ever opened the pooled client
+    await graders.close()
+
 def generate_room_code(length=6):
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length)) 
 
+def matchmaking_rating(username: str):
+    # Average round score across all past games; newcomers start mid-table
+    rating = global_leaderboard.average_score(username)
+    return DEFAULT_RATING if rating is None else rating
+
+def coalesce_input(websocket: WebSocket, limiter: ConnectionLimiter, data: dict):
+    # Over-limit key events: keep only the latest state per key and apply it when a token frees up
+    limiter.pending_keys[data["key"]] = data["type"] == "keydown"
+    schedule_input_flush(websocket, limiter)
+
+def schedule_input_flush(websocket: WebSocket, limiter: ConnectionLimiter):
+    if limiter.flush_handle is None:
+        delay = limiter.bucket("input").wait_time()
+        limiter.flush_handle = asyncio.get_running_loop().call_later(delay, flush_coalesced_input, websocket)
+
+def flush_coalesced_input(websocket: WebSocket):
+    data = manager.active_connections.get(websocket)
+    if not data:
+        return
+    limiter = data["limiter"]
+    limiter.flush_handle = None
+    if not limiter.pending_keys:
+        return
+    # The merged key state is one input dispatch and pays for it like any other
+    if not limiter.take("keydown"):
+        schedule_input_flush(websocket, limiter)
+        return
+    pending, limiter.pending_keys = limiter.pending_keys, {}
+    game = games.get(data.get("room_code"))
+    if game and data.get("user_id"):
+        for key, is_down in pending.items():
+            game.handle_input(data["user_id"], key, is_down=is_down)
+
+async def handle_match(tickets, question_type: str):
+    # Open a room for a matched group and send everyone its code; they join it like any other room
+    websockets = [t.key for t in tickets if t.key in manager.active_connections]
+    if not websockets:
+        return
+    if drain.draining:
+        await manager.send_to_connections(websockets, {"type": "server_draining", "url": PEER_WS_URL})
+        return
+    if len(games) >= MAX_ROOMS:
+        await manager.send_to_connections(websockets, {"type": "error", "message": "Server is full, try again later"})
+        return
+
+    room_code = generate_room_code()
+    while room_code in games:
+        room_code = generate_room_code()
+    game = Game()
+    game.settings["question_type"] = question_type
+    games[room_code] = game
+    log.info("match_found", room=room_code, players=len(websockets), question_type=question_type,
+             ratings=[round(t.rating) for t in tickets])
+
+    await manager.send_to_connections(websockets, {
+        "type": "match_found",
+        "room_code": room_code,
+        "question_type": question_type,
+        "players": [t.username for t in tickets]
+    })
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_json()
+            if not isinstance(data, dict):
+                data = {}
             message_type = data.get("type")
+            if not isinstance(message_type, str):
+                message_type = data["type"] = "unknown"
+            if message_type in COALESCED_TYPES and not isinstance(data.get("key"), str):
+                continue # Malformed input: nothing to bucket or apply
+
+            # Flood protection: per-connection token bucket per message type, checked before any work
+            limiter = manager.active_connections[websocket]["limiter"]
+            outcome = limiter.check(message_type)
+            rate_limits.count(message_type, outcome)
+            if outcome != "allow":
+                if outcome == "coalesce":
+                    coalesce_input(websocket, limiter, data)
+                if limiter.is_offender():
+                    conn = manager.active_connections[websocket]
+                    log.warning("rate_limit_disconnect", room=conn.get("room_code"), user=conn.get("user_id"),
+                                message_type=message_type)
+                    rate_limits.disconnects += 1
+                    # No seat is held for a client that was cut off for flooding
+                    sessions.discard(conn.get("session"))
+                    conn["session"] = None
+                    await websocket.close(code=1008)
+                    raise WebSocketDisconnect(code=1008)
+                continue
+            if message_type in COALESCED_TYPES:
+                limiter.pending_keys.pop(data.get("key"), None) # Newer than anything still pending
+
+            current_room = games.get(manager.active_connections[websocket].get("room_code"))
+            if current_room:
+                current_room.last_activity = time.time()
             # print(f"Received: {data}")
 
             if message_type == "create_room":
+                manager.remove_spectator(websocket)
+                previous_seat = manager.seat(websocket)
+                if drain.draining:
+                    # No new rooms here; the client retries against the peer
+                    await websocket.send_json({"type": "server_draining", "url": PEER_WS_URL})
+                    continue
+                if len(games) >= MAX_ROOMS:
+                    await websocket.send_json({"type": "error", "message": "Server is full, try again later"})
+                    continue
                 username = data.get("username")
                 room_code = generate_room_code()
                 
@@ -438,7 +1155,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 # Initialize creator's vote to default
                 games[room_code].votes[user_id] = 3
                 games[room_code].leader = user_id # Creator is leader
-                print(f"Created new room: {room_code} by {user_id} ({username})")
+                log.info("room_created", room=room_code, user=user_id, username=username)
                 
                 manager.active_connections[websocket]["username"] = username 
                 manager.active_connections[websocket]["user_id"] = user_id
@@ -452,32 +1169,50 @@ async def websocket_endpoint(websocket: WebSocket):
                 
                 # Add to game state immediately
                 games[room_code].players[user_id] = PlayerState(username)
+                games[room_code].wake(force_snapshot=True)
 
                 # START PHYSICS
                 await games[room_code].start_physics(room_code)
 
-                # Send welcome
-                await websocket.send_json({
+                # Send welcome (with a token to resume this seat after a dropped connection)
+                session = sessions.create(room_code, user_id, username)
+                manager.active_connections[websocket]["session"] = session.token
+                await manager.send(websocket, {
                     "type": "welcome",
                     "id": user_id,
                     "username": username,
-                    "room_code": room_code
+                    "room_code": room_code,
+                    "resume_token": session.token
                 })
 
                 await manager.broadcast_player_list(room_code)
+                await manager.sync_video_demand(room_code)
+                matchmaker.remove(websocket) # Seated: a queued ticket would match them into a second room
+                await release_seat(*previous_seat)
 
             elif message_type == "join":
                 # ... existing join logic ...
+                manager.remove_spectator(websocket) # A spectator can take a seat
+                previous_seat = manager.seat(websocket)
                 username = data.get("username")
                 room_code = data.get("room_code", "").upper()
                 
+                if room_code not in games and drain.draining:
+                    await websocket.send_json({"type": "server_draining", "url": PEER_WS_URL})
+                    continue
+
+                if room_code not in games and len(games) >= MAX_ROOMS:
+                    await websocket.send_json({"type": "error", "message": "Server is full, try again later"})
+                    continue
+
                 if room_code not in games:
-                    print(f"Room {room_code} not found, auto-creating...")
+                    log.info("room_auto_created", room=room_code, username=username)
                     games[room_code] = Game()
 
-                # Generate unique ID
+                # Generate unique ID (seats held for reconnecting players are taken too)
                 user_id = f"Guest{random.randint(100, 999)}"
                 active_ids = [d["user_id"] for d in manager.active_connections.values() if d.get("room_code") == room_code]
+                active_ids += list(games[room_code].players.keys())
                 while user_id in active_ids:
                     user_id = f"Guest{random.randint(100, 999)}"
 
@@ -485,22 +1220,26 @@ async def websocket_endpoint(websocket: WebSocket):
                 manager.active_connections[websocket]["user_id"] = user_id
                 manager.active_connections[websocket]["room_code"] = room_code
                 
-                print(f"Player {username} -> {user_id} joined room {room_code}")
+                log.info("player_joined", room=room_code, user=user_id, username=username)
 
                 # START PHYSICS (if not already running)
                 await games[room_code].start_physics(room_code)
 
-                # Send welcome
-                await websocket.send_json({
+                # Send welcome (with a token to resume this seat after a dropped connection)
+                session = sessions.create(room_code, user_id, username)
+                manager.active_connections[websocket]["session"] = session.token
+                await manager.send(websocket, {
                     "type": "welcome",
                     "id": user_id, 
                     "username": username, 
-                    "room_code": room_code
+                    "room_code": room_code,
+                    "resume_token": session.token
                 })
                 
                 # Add to game state immediately using ID
                 if user_id not in games[room_code].players:
                     games[room_code].players[user_id] = PlayerState(username)
+                games[room_code].wake(force_snapshot=True)
 
                 # Send current settings to the new joiner
                 game = games[room_code]
@@ -509,26 +1248,141 @@ async def websocket_endpoint(websocket: WebSocket):
                 if user_id not in game.votes:
                      game.votes[user_id] = 3
                      
-                await websocket.send_json({
+                await manager.send(websocket, {
                     "type": "settings_update",
                     "settings": game.settings,
                     "votes": game.votes
                 })
                 
                 await manager.broadcast_player_list(room_code)
+                await manager.sync_video_demand(room_code)
                 
                 # If game is in progress, sync state
                 if game.state != "LOBBY":
-                    # Determine current phase details
-                    # Note: We need to send relevant info depending on phase
-                    await websocket.send_json({
-                        "type": "sync_game_state",
-                        "phase": game.state, # QUESTION, RESULTS, INTERMISSION
-                        "question": game.current_question,
-                        "current_round": game.current_round,
-                        "total_rounds": game.settings["num_rounds"],
-                        "round_end_time": game.round_end_time
+                    await send_game_state(websocket, game)
+
+                # Released only now, so re-joining the same room doesn't empty (and delete) it first
+                matchmaker.remove(websocket)
+                await release_seat(*previous_seat)
+
+            elif message_type == "spectate":
+                # Watch a room without playing: no seat, no physics, no grading, shared reduced stream
+                room_code = (data.get("room_code") or "").upper()
+                if manager.active_connections[websocket].get("room_code"):
+                    await websocket.send_json({"type": "error", "message": "Already playing in a room"})
+                    continue
+                game = games.get(room_code)
+                if not game:
+                    await websocket.send_json({"type": "error", "message": "Room not found"})
+                    continue
+                first = spectators.count(room_code) == 0
+                if not spectators.add(room_code, websocket):
+                    await websocket.send_json({"type": "error", "message": "Room is full of spectators"})
+                    continue
+
+                await websocket.send_json({
+                    "type": "spectating",
+                    "room_code": room_code,
+                    "video_tier": SPECTATOR_VIDEO_TIER
+                })
+                await websocket.send_json({
+                    "type": "sync_game_state",
+                    "phase": game.state,
+                    "question": game.current_question,
+                    "current_round": game.current_round,
+                    "total_rounds": game.settings["num_rounds"],
+                    "round_end_time": game.round_end_time
+                })
+                for message in spectators.replay(room_code):
+                    await websocket.send_json(message)
+                if first:
+                    await manager.sync_video_demand(room_code) # Publishers start sending the spectator tier
+
+            elif message_type == "resume":
+                # { token, last_seq } - reattach to a seat kept during the grace period
+                session = sessions.get(data.get("token"))
+                if not session or session.room_code not in games:
+                    await websocket.send_json({"type": "resume_failed"})
+                    continue
+
+                # Drop a half-open old socket for the same seat, if the server hasn't noticed it yet
+                for conn, d in list(manager.active_connections.items()):
+                    if conn is not websocket and d.get("session") == session.token:
+                        manager.disconnect(conn) # Its loop ends later and finds nothing left to clean up
+                previous_seat = manager.seat(websocket)
+                if previous_seat[2] == session.token:
+                    previous_seat = (None, None, None)
+                sessions.attach(session.token)
+
+                room_code = session.room_code
+                game = games[room_code]
+                manager.active_connections[websocket].update({
+                    "username": session.username,
+                    "user_id": session.user_id,
+                    "room_code": room_code,
+                    "session": session.token
+                })
+                if session.user_id not in game.players:
+                    game.players[session.user_id] = PlayerState(session.username)
+                game.wake(force_snapshot=True)
+                log.info("player_resumed", room=room_code, user=session.user_id)
+
+                await websocket.send_json({
+                    "type": "resumed",
+                    "id": session.user_id,
+                    "username": session.username,
+                    "room_code": room_code,
+                    "resume_token": session.token
+                })
+
+                last_seq = data.get("last_seq")
+                if not isinstance(last_seq, int) or isinstance(last_seq, bool):
+                    last_seq = 0 # Malformed: replay everything still buffered (or fully resync)
+                missed = session.replay_since(last_seq)
+                if missed is None:
+                    # Buffer overflowed - fall back to a full state sync
+                    sessions.counters["full_resyncs"] += 1
+                    await manager.send(websocket, {
+                        "type": "settings_update",
+                        "settings": game.settings,
+                        "votes": game.votes
                     })
+                    if game.state != "LOBBY":
+                        await send_game_state(websocket, game)
+                else:
+                    sessions.counters["replayed_messages"] += len(missed)
+                    for message in missed:
+                        await websocket.send_json(message)
+
+                await manager.broadcast_player_list(room_code)
+                await manager.sync_video_demand(room_code)
+                matchmaker.remove(websocket)
+                await release_seat(*previous_seat)
+
+            elif message_type == "queue_join":
+                # Solo queue: wait to be grouped with players of similar rating
+                if drain.draining:
+                    await websocket.send_json({"type": "server_draining", "url": PEER_WS_URL})
+                    continue
+                if manager.active_connections[websocket].get("room_code"):
+                    await websocket.send_json({"type": "error", "message": "Already playing in a room"})
+                    continue
+                username = data.get("username")
+                if not username:
+                    continue
+                ticket = matchmaker.enqueue(
+                    websocket, username, matchmaking_rating(username), data.get("question_type"), handle_match
+                )
+                await websocket.send_json({
+                    "type": "queue_joined",
+                    "rating": round(ticket.rating),
+                    "question_type": ticket.question_type,
+                    "expected_wait": matchmaker.expected_wait()
+                })
+
+            elif message_type == "queue_leave":
+                if matchmaker.remove(websocket):
+                    await websocket.send_json({"type": "queue_left"})
 
             elif message_type == "update_settings":
                 room_code = manager.active_connections[websocket]["room_code"]
@@ -536,12 +1390,12 @@ async def websocket_endpoint(websocket: WebSocket):
                 if not room_code or room_code not in games: continue
                 
                 game = games[room_code]
-                print(f"Update settings: {user_id} in {room_code}. State: {game.state}")
+                log.debug("settings_update", room=room_code, user=user_id, state=game.state)
                 if game.state == "LOBBY":
                     new_settings = data.get("settings", {})
                     # Cast vote
                     rounds = new_settings.get("num_rounds", 3)
-                    print(f"Casting vote: {rounds}")
+                    log.info("settings_vote", room=room_code, user=user_id, rounds=rounds)
                     rounds = new_settings.get("num_rounds")
                     
                     if rounds is not None:
@@ -549,11 +1403,8 @@ async def websocket_endpoint(websocket: WebSocket):
                          rounds = max(1, min(10, int(rounds)))
                          game.settings["num_rounds"] = rounds
                     
-                    # Broadcast updated settings
-                    await manager.broadcast_to_room(room_code, {
-                        "type": "settings_update",
-                        "settings": game.settings
-                    })
+                    # Broadcast updated settings (coalesced with other votes in the same window)
+                    await manager.broadcast_settings(room_code)
 
             elif message_type == "start_game":
                 # Only leader can start
@@ -563,7 +1414,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 game = games[room_code]
 
                 if game.leader and game.leader != user_id:
-                    print(f"User {user_id} tried to start game but is not leader ({game.leader})")
+                    log.warning("start_denied", room=room_code, user=user_id, leader=game.leader)
                     continue
                 
                 # Broadcast STARTING event for countdown on frontend
@@ -572,12 +1423,15 @@ async def websocket_endpoint(websocket: WebSocket):
                 })
                 
                 # 3 second countdown logic on server (wait before sending new question)
+                game.starting = True
                 await asyncio.sleep(3) 
+                game.starting = False
 
                 # Reset game state
                 if game.state == "LOBBY" or game.state == "GAME_OVER":
                      game.current_round = 0
                      game.cumulative_scores = {}
+                     game.leaderboard_cache = None
                 
                 question = await game.start_round(room_code)
                 
@@ -599,7 +1453,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 game = games[room_code]
 
                 if game.leader and game.leader != user_id:
-                    print(f"User {user_id} tried to skip intermission but is not leader")
+                    log.warning("skip_denied", room=room_code, user=user_id, leader=game.leader)
                     continue
                 
                 if game.state == "INTERMISSION":
@@ -659,6 +1513,9 @@ async def websocket_endpoint(websocket: WebSocket):
                 game = games[room_code]
                 user_id = manager.active_connections[websocket]["user_id"]
                 submission_content = data.get("content")
+                if not isinstance(submission_content, str):
+                    # Graded and stored as text; anything else from the client is coerced
+                    submission_content = "" if submission_content is None else str(submission_content)
                 
                 # Store submission WITHOUT grading
                 game.submissions[user_id] = {
@@ -673,6 +1530,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 # Update player state
                 if user_id in game.players:
                     game.players[user_id].has_submitted = True
+                    game.wake() # Show the submitted badge now, not at the next hibernation poll
                 
                 # Check for round end
                 room_players_count = len([
@@ -681,11 +1539,11 @@ async def websocket_endpoint(websocket: WebSocket):
                 ])
                 
                 if len(game.submissions) >= room_players_count:
-                    print("All players submitted. Triggering batch grading...")
+                    log.info("all_submitted", room=room_code, round=game.current_round)
                     # Trigger batch grading now
-                    await game.perform_batch_grading()
+                    await game.perform_batch_grading(room_code)
                     
-                    results = game.end_round()
+                    results = game.end_round(room_code)
                     leaderboard = game.get_leaderboard()
                     
                     # Schedule automatic next round (Intermission)
@@ -705,37 +1563,95 @@ async def websocket_endpoint(websocket: WebSocket):
                 username = manager.active_connections[websocket]["username"]
                 room_code = manager.active_connections[websocket]["room_code"]
                 frame_data = data.get("frame")
+                tier = normalize_tier(data.get("tier", LEGACY_TIER))
                 
+                if room_code and tier and tier != "off" and isinstance(frame_data, str):
+                    video_relay.mark_published(room_code, user_id, tier)
+                    room_size = sum(1 for d in manager.active_connections.values() if d.get("room_code") == room_code)
+                    tier_count = len(video_relay.published_tiers(room_code, user_id))
+                    targets = video_targets(room_code, user_id, tier)
+                    action, delay = video_governor.offer(room_code, user_id, tier, frame_data, room_size,
+                                                         tier_count, recipient_key(targets))
+
+                    if action == "forward":
+                        await relay_video_frame(room_code, user_id, username, tier, frame_data, targets)
+                    elif action == "schedule":
+                        asyncio.create_task(flush_video_frame(room_code, user_id, username, tier, delay))
+
+            elif message_type == "video_subscribe":
+                # { default: tier, players: { user_id: tier } } - tiers: high / mid / low / off
+                room_code = manager.active_connections[websocket]["room_code"]
+                default_tier = normalize_tier(data.get("default"))
+                requested = data.get("players")
+                players = {
+                    uid: normalize_tier(tier)
+                    for uid, tier in (requested if isinstance(requested, dict) else {}).items()
+                    if normalize_tier(tier)
+                }
+                manager.active_connections[websocket]["video_subs"] = {
+                    "default": default_tier,
+                    "players": players
+                }
                 if room_code:
-                    # Broadcast with ID
-                    await manager.broadcast_to_room(room_code, {
-                        "type": "video_update",
-                        "id": user_id,
-                        "username": username,
-                        "frame": frame_data
-                    })
+                    await manager.sync_video_demand(room_code)
+
+            elif message_type == "audio_codec":
+                # Client offers codecs in preference order, e.g. { codecs: ["mulaw", "pcm16"], sample_rate: 16000 }
+                codec, rate = negotiate_format(data.get("codecs"), data.get("sample_rate"))
+                manager.active_connections[websocket]["audio_format"] = {"codec": codec, "sample_rate": rate}
+                await websocket.send_json({
+                    "type": "audio_codec",
+                    "codec": codec,
+                    "sample_rate": rate
+                })
 
             elif message_type == "audio_update":
                 user_id = manager.active_connections[websocket]["user_id"]
                 room_code = manager.active_connections[websocket]["room_code"]
                 chunk = data.get("chunk")
                 to_id = data.get("to_id")
+                src_format = connection_format(manager.active_connections[websocket])
                 
+                if room_code and VAD_ENABLED:
+                    try:
+                        samples = decode_chunk(chunk, src_format[0])
+                    except (ValueError, TypeError):
+                        continue
+                    activity = voice_gate.check(room_code, user_id, samples, src_format[1])
+                    if activity in ("silent", "end"):
+                        if activity == "end" and VAD_COMFORT_NOISE:
+                            # Tell listeners the speaker went quiet (clients may fill with comfort noise)
+                            silence = {
+                                "type": "audio_silence",
+                                "id": user_id,
+                                "level_db": voice_gate.noise_level_db(room_code, user_id)
+                            }
+                            if to_id:
+                                await manager.send_personal_message(to_id, silence, room_code)
+                            else:
+                                await manager.broadcast_to_room(room_code, silence)
+                        continue
+
                 if room_code:
                      if to_id:
                          # Private Unicast
-                         await manager.send_personal_message(to_id, {
-                            "type": "audio_update",
-                            "id": user_id,
-                            "chunk": chunk
-                         })
+                         targets = {
+                             conn: d for conn, d in manager.active_connections.items()
+                             if d.get("user_id") == to_id and d.get("room_code") == room_code
+                         }
+                         await relay_audio_chunk(targets, user_id, chunk, src_format)
+                     elif SERVER_MIX_ENABLED:
+                         # Mixed server-side, each listener gets one stream
+                         audio_mixer.push(room_code, user_id, chunk, src_format)
                      else:
-                         # Public Broadcast
-                         await manager.broadcast_to_room(room_code, {
-                            "type": "audio_update",
-                            "id": user_id,
-                            "chunk": chunk
-                         })
+                         # Public Broadcast (only to players within earshot while on the map)
+                         near = nearby_players(room_code, user_id, AUDIO_RADIUS)
+                         targets = {
+                             conn: d for conn, d in manager.active_connections.items()
+                             if d.get("room_code") == room_code and (near is None or d.get("user_id") in near)
+                         }
+                         gains = {uid: audio_gain(distance) for uid, distance in near.items()} if near is not None else None
+                         await relay_audio_chunk(targets, user_id, chunk, src_format, gains)
 
             elif message_type == "coffee_invite":
                 target_id = data.get("target_id")
@@ -757,8 +1673,11 @@ async def websocket_endpoint(websocket: WebSocket):
                 if room_code in games:
                     if sender_id in games[room_code].players:
                         games[room_code].players[sender_id].is_chatting = True
+                        games[room_code].players[sender_id].chat_partner = target_id
                     if target_id in games[room_code].players:
                         games[room_code].players[target_id].is_chatting = True
+                        games[room_code].players[target_id].chat_partner = sender_id
+                    games[room_code].wake()
                 
                 # Notify both to start
                 await manager.send_personal_message(target_id, {
@@ -779,8 +1698,11 @@ async def websocket_endpoint(websocket: WebSocket):
                 if room_code in games:
                     if sender_id in games[room_code].players:
                         games[room_code].players[sender_id].is_chatting = False
+                        games[room_code].players[sender_id].chat_partner = None
                     if target_id in games[room_code].players:
                         games[room_code].players[target_id].is_chatting = False
+                        games[room_code].players[target_id].chat_partner = None
+                    games[room_code].wake()
                 
                 if target_id:
                      await manager.send_personal_message(target_id, {
@@ -805,23 +1727,34 @@ async def websocket_endpoint(websocket: WebSocket):
                     games[room_code].handle_input(user_id, key, is_down=False)
 
     except WebSocketDisconnect:
-        # We need the user_id before disconnecting to remove from game state
-        room_code, user_id_removed = manager.disconnect(websocket)
-        
-        if room_code:
-            # Sync game state
-            if room_code in games and user_id_removed:
-                 if user_id_removed in games[room_code].players:
-                     del games[room_code].players[user_id_removed]
-            
-            await manager.broadcast_player_list(room_code)
-            # Check if room is empty
-            active_ids = [p["user_id"] for p in manager.active_connections.values() if p.get("room_code") == room_code]
-            if not active_ids and room_code in games:
-                print(f"Room {room_code} is empty. Deleting...")
-                if hasattr(games[room_code], 'cleanup'):
-                    games[room_code].cleanup()
-                del games[room_code]
+        await handle_disconnect(websocket)
     except Exception as e:
-        print(f"Error: {e}")
-        manager.disconnect(websocket)
+        log.error("ws_error", room=manager.active_connections.get(websocket, {}).get("room_code"), error=repr(e))
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+        await handle_disconnect(websocket)
+
+async def handle_disconnect(websocket: WebSocket):
+    # We need the user_id before disconnecting to remove from game state
+    token = manager.active_connections.get(websocket, {}).get("session")
+    room_code, user_id_removed = manager.disconnect(websocket)
+
+    if room_code:
+        if token and sessions.detach(token, remove_player):
+            # Keep the seat for the grace period; remove_player runs if they don't resume
+            log.info("seat_held", room=room_code, user=user_id_removed)
+            if room_code in games and user_id_removed in games[room_code].players:
+                p = games[room_code].players[user_id_removed]
+                p.keys = {k: False for k in p.keys} # Don't keep walking while away
+                games[room_code].wake()
+            await manager.broadcast_player_list(room_code)
+        else:
+            await remove_player(room_code, user_id_removed)
+
+if __name__ == "__main__":
+    # Same server as the dev script, websockets with the per-message-type deflate policy
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")),
+                ws="compression:PolicyWebSocketProtocol")
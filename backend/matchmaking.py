@@ -0,0 +1,156 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+from log import log
+
+# Players per matched room
+MATCH_ROOM_SIZE = int(os.getenv("MATCHMAKING_ROOM_SIZE", "4"))
+# After PARTIAL_ROOM_SECONDS a room is started with at least this many
+MATCH_MIN_SIZE = 2
+PARTIAL_ROOM_SECONDS = float(os.getenv("MATCHMAKING_PARTIAL_SECONDS", "30"))
+# After this a lone player gets a room of their own
+SOLO_ROOM_SECONDS = float(os.getenv("MATCHMAKING_SOLO_SECONDS", "90"))
+# How often queued players are matched
+MATCH_TICK_SECONDS = 0.5
+
+# Ratings are average round scores (0-100), bucketed so a lookup touches a handful of buckets
+RATING_BUCKET_WIDTH = 10
+DEFAULT_RATING = 50
+# The search reaches one more bucket either side per this many seconds waited
+BUCKET_WIDEN_SECONDS = 10
+MAX_BUCKET_SPREAD = 10
+
+QUESTION_TYPES = ("technical", "behavioral")
+ANY_TYPE = "any"
+
+
+def normalize_question_type(value):
+    if not isinstance(value, str):
+        return ANY_TYPE
+    value = value.lower()
+    return value if value in QUESTION_TYPES else ANY_TYPE
+
+
+class Ticket:
+    __slots__ = ("key", "username", "rating", "bucket", "question_type", "enqueued_at")
+
+    def __init__(self, key, username: str, rating: float, question_type: str):
+        self.key = key
+        self.username = username
+        self.rating = rating
+        self.bucket = int(max(0, rating) // RATING_BUCKET_WIDTH)
+        self.question_type = question_type
+        self.enqueued_at = time.time()
+
+
+class Matchmaker:
+    """
+    Solo queue. Waiting players are indexed by (question type, rating bucket); each tick the
+    longest waiters pull partners from their own bucket outwards, widening with wait time.
+    on_match(tickets, question_type) is awaited for every group formed.
+    """
+    def __init__(self):
+        self.buckets = {}  # {(question_type, bucket): OrderedDict[key, Ticket]}
+        self.tickets = OrderedDict()  # {key: Ticket}, oldest first
+        self.on_match = None
+        self.task = None
+        self.recent_waits = deque(maxlen=500)
+        self.counters = {"queued": 0, "left": 0, "matched": 0, "rooms": 0}
+
+    def enqueue(self, key, username: str, rating: float, question_type: str, on_match):
+        self.remove(key)
+        ticket = Ticket(key, username, rating, normalize_question_type(question_type))
+        self.tickets[key] = ticket
+        self.buckets.setdefault((ticket.question_type, ticket.bucket), OrderedDict())[key] = ticket
+        self.counters["queued"] += 1
+        self.on_match = on_match
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return ticket
+
+    def _unlink(self, ticket: Ticket):
+        self.tickets.pop(ticket.key, None)
+        index = (ticket.question_type, ticket.bucket)
+        bucket = self.buckets.get(index)
+        if bucket is not None:
+            bucket.pop(ticket.key, None)
+            if not bucket:
+                del self.buckets[index]
+
+    def remove(self, key):
+        ticket = self.tickets.get(key)
+        if not ticket:
+            return False
+        self._unlink(ticket)
+        self.counters["left"] += 1
+        return True
+
+    def _gather(self, ticket: Ticket, now: float):
+        """Up to MATCH_ROOM_SIZE compatible tickets (nearest buckets first) and the group's question type."""
+        spread = min(MAX_BUCKET_SPREAD, int((now - ticket.enqueued_at) // BUCKET_WIDEN_SECONDS))
+        group_type = None if ticket.question_type == ANY_TYPE else ticket.question_type
+        group = [ticket]
+        offsets = [0]
+        for distance in range(1, spread + 1):
+            offsets += [-distance, distance]
+
+        for offset in offsets:
+            for question_type in QUESTION_TYPES + (ANY_TYPE,):
+                if group_type and question_type not in (group_type, ANY_TYPE):
+                    continue
+                bucket = self.buckets.get((question_type, ticket.bucket + offset))
+                if not bucket:
+                    continue
+                for other in bucket.values():
+                    if other is ticket:
+                        continue
+                    group.append(other)
+                    if question_type != ANY_TYPE:
+                        group_type = question_type
+                    if len(group) >= MATCH_ROOM_SIZE:
+                        return group, group_type
+        return group, group_type
+
+    async def run(self):
+        while self.tickets:
+            await asyncio.sleep(MATCH_TICK_SECONDS)
+            now = time.time()
+            for key in list(self.tickets):
+                ticket = self.tickets.get(key)
+                if ticket is None:
+                    continue  # matched earlier this tick
+                group, question_type = self._gather(ticket, now)
+                waited = now - ticket.enqueued_at
+                if not (len(group) >= MATCH_ROOM_SIZE
+                        or (len(group) >= MATCH_MIN_SIZE and waited >= PARTIAL_ROOM_SECONDS)
+                        or waited >= SOLO_ROOM_SECONDS):
+                    continue
+                for member in group:
+                    self._unlink(member)
+                    self.recent_waits.append(now - member.enqueued_at)
+                self.counters["matched"] += len(group)
+                self.counters["rooms"] += 1
+                try:
+                    await self.on_match(group, question_type)
+                except Exception as e:
+                    log.error("matchmaking_handoff_failed", players=len(group), error=repr(e))
+
+    def expected_wait(self):
+        if not self.recent_waits:
+            return None
+        waits = sorted(self.recent_waits)
+        return waits[len(waits) // 2]
+
+    def stats(self):
+        now = time.time()
+        waits = sorted(self.recent_waits)
+        return {
+            **self.counters,
+            "waiting": len(self.tickets),
+            "buckets": len(self.buckets),
+            "oldest_wait": round(now - next(iter(self.tickets.values())).enqueued_at, 1) if self.tickets else 0,
+            "wait_p50": round(waits[len(waits) // 2], 1) if waits else None,
+            "wait_p95": round(waits[int(len(waits) * 0.95)], 1) if waits else None,
+        }
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import random
+import asyncio
+import urllib.request
+import urllib.error
+
+from log import log
+
+# Peer process that takes over live rooms while this one drains (e.g. the next deploy)
+PEER_URL = os.getenv("MIGRATION_PEER_URL", "http://127.0.0.1:8001")
+# WebSocket URL clients reconnect to after their room moved
+PEER_WS_URL = os.getenv("MIGRATION_PEER_WS_URL", "ws://127.0.0.1:8001/ws")
+# Shared secret for the internal endpoints (both processes must agree)
+MIGRATION_SECRET = os.getenv("MIGRATION_SECRET", "")
+# How often the drain loop re-checks rooms that are mid-phase (grading, countdown)
+DRAIN_POLL_SECONDS = 0.5
+# After this long, rooms still mid-phase are moved anyway
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "120"))
+# Clients reconnect at a random delay up to this, so a room move isn't a join spike
+RECONNECT_JITTER_MS = int(os.getenv("MIGRATION_RECONNECT_JITTER_MS", "1500"))
+# Pause between rooms so the peer imports them at a steady rate
+ROOM_PACING_SECONDS = 0.05
+
+
+def authorized(secret: str):
+    return bool(MIGRATION_SECRET) and secret == MIGRATION_SECRET
+
+
+def reconnect_delay_ms():
+    return random.randint(0, RECONNECT_JITTER_MS)
+
+
+def _post_json(url: str, payload: dict):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json", "X-Migration-Secret": MIGRATION_SECRET},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError) as e:
+        log.error("migration_transfer_failed", error=repr(e))
+        return None
+
+
+async def transfer_room(payload: dict):
+    """Sends a serialized room to the peer. True if the peer now owns it."""
+    status = await asyncio.to_thread(_post_json, f"{PEER_URL}/internal/rooms/import", payload)
+    return status == 200
+
+
+class DrainController:
+    """
+    Drain mode: no new rooms, and every live room is handed to the peer once it reaches a
+    safe point (not grading / counting down), or when DRAIN_TIMEOUT_SECONDS runs out.
+    """
+    def __init__(self):
+        self.draining = False
+        self.started_at = None
+        self.task = None
+        self.migrated = []
+        self.failed = set()
+
+    def start(self, list_rooms, is_safe, migrate_room):
+        if self.draining:
+            return False
+        self.draining = True
+        self.started_at = time.time()
+        self.task = asyncio.create_task(self.run(list_rooms, is_safe, migrate_room))
+        return True
+
+    async def run(self, list_rooms, is_safe, migrate_room):
+        log.warning("drain_started", peer=PEER_URL)
+        while True:
+            rooms = list_rooms()
+            if not rooms:
+                break
+            overdue = time.time() - self.started_at > DRAIN_TIMEOUT_SECONDS
+            for room_code in rooms:
+                if not (is_safe(room_code) or overdue):
+                    continue
+                if await migrate_room(room_code):
+                    self.migrated.append(room_code)
+                    self.failed.discard(room_code)
+                else:
+                    self.failed.add(room_code)
+                await asyncio.sleep(ROOM_PACING_SECONDS)
+            if overdue and self.failed:
+                break  # peer is refusing rooms; keep serving what's left
+            await asyncio.sleep(DRAIN_POLL_SECONDS)
+        log.warning("drain_finished", migrated=len(self.migrated), failed=len(self.failed))
+
+    def status(self):
+        return {
+            "draining": self.draining,
+            "started_at": self.started_at,
+            "done": bool(self.task and self.task.done()),
+            "migrated": len(self.migrated),
+            "failed": len(self.failed),
+            "peer": PEER_URL,
+        }
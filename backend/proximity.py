@@ -0,0 +1,57 @@
+import os
+import math
+
+# Phases where players walk around the shared map (IntermissionCanvas), so media is routed by distance
+PROXIMITY_PHASES = ("LOBBY", "INTERMISSION")
+# Public audio only reaches listeners this close (AudioChat fades to silence at 600px)
+AUDIO_RADIUS = float(os.getenv("MEDIA_AUDIO_RADIUS", "600"))
+# Video only reaches listeners this close (roughly what fits on screen around them)
+VIDEO_RADIUS = float(os.getenv("MEDIA_VIDEO_RADIUS", "1000"))
+# Full volume inside this distance, linear fade out to AUDIO_RADIUS
+FULL_VOLUME_RADIUS = 100.0
+
+
+def audio_gain(distance: float):
+    if distance <= FULL_VOLUME_RADIUS:
+        return 1.0
+    if distance >= AUDIO_RADIUS:
+        return 0.0
+    return round(1.0 - (distance - FULL_VOLUME_RADIUS) / (AUDIO_RADIUS - FULL_VOLUME_RADIUS), 2)
+
+
+class SpatialGrid:
+    """Uniform grid over player positions, rebuilt every physics tick. Lookups only scan nearby cells."""
+    def __init__(self, cell_size: float = max(AUDIO_RADIUS, VIDEO_RADIUS)):
+        self.cell_size = cell_size
+        self.cells = {}  # {(cx, cy): [user_id]}
+        self.positions = {}  # {user_id: (x, y)}
+
+    def cell_of(self, x: float, y: float):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def rebuild(self, players: dict):
+        # players: {user_id: PlayerState}
+        self.cells = {}
+        self.positions = {}
+        for uid, p in players.items():
+            self.positions[uid] = (p.x, p.y)
+            self.cells.setdefault(self.cell_of(p.x, p.y), []).append(uid)
+
+    def nearby(self, user_id: str, radius: float):
+        """{user_id: distance} of others within radius, or None if user_id has no position yet."""
+        if user_id not in self.positions:
+            return None
+        x, y = self.positions[user_id]
+        cx, cy = self.cell_of(x, y)
+        rings = math.ceil(radius / self.cell_size)
+        found = {}
+        for gx in range(cx - rings, cx + rings + 1):
+            for gy in range(cy - rings, cy + rings + 1):
+                for uid in self.cells.get((gx, gy), ()):
+                    if uid == user_id:
+                        continue
+                    ox, oy = self.positions[uid]
+                    distance = math.hypot(ox - x, oy - y)
+                    if distance <= radius:
+                        found[uid] = distance
+        return found
@@ -99,6 +99,7 @@ QUESTIONS = [
     }
 ]
 
-def get_random_question():
+def get_random_question(question_type=None):
     import random
-    return random.choice(QUESTIONS)
+    pool = [q for q in QUESTIONS if q["type"] == question_type] if question_type else QUESTIONS
+    return random.choice(pool or QUESTIONS)
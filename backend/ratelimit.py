@@ -0,0 +1,117 @@
+import os
+import time
+
+# (tokens per second, burst) per client message type, set from what a well-behaved client sends
+MESSAGE_LIMITS = {
+    "input": (20, 40),  # keydown / keyup, sampled at ~20 Hz
+    "video_update": (30, 45),  # 15 fps high tier plus the lower simulcast tiers
+    "audio_update": (10, 20),  # ~3 chunks/s from the capture processor
+    "coffee_invite": (1, 3),
+    "coffee_accept": (1, 3),
+    "submit": (1, 3),
+    "create_room": (0.5, 3),
+    "join": (0.5, 3),
+    "resume": (0.5, 3),
+    "queue_join": (0.5, 3),
+}
+# Everything else shares one control-message bucket
+DEFAULT_LIMIT = (10, 20)
+
+# Input events over the limit are merged (latest state per key wins) instead of dropped
+COALESCED_TYPES = {"keydown", "keyup"}
+
+# A connection with this many rejected messages inside OFFENDER_WINDOW_SECONDS is disconnected
+OFFENDER_THRESHOLD = int(os.getenv("RATE_LIMIT_OFFENDER_THRESHOLD", "300"))
+OFFENDER_WINDOW_SECONDS = 10.0
+
+
+def limit_key(message_type):
+    # Bucket / counter name for a message type (unknown types can't grow the tables)
+    if not isinstance(message_type, str):
+        return "other"
+    if message_type in COALESCED_TYPES:
+        return "input"
+    return message_type if message_type in MESSAGE_LIMITS else "other"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        """Seconds until the next token is available."""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class ConnectionLimiter:
+    """Token buckets for one connection, created lazily per message type."""
+    def __init__(self):
+        self.buckets = {}
+        self.rejected = 0
+        self.window_start = time.monotonic()
+        self.pending_keys = {}  # {key: is_down} coalesced input waiting for a token
+        self.flush_handle = None
+
+    def bucket(self, message_type: str):
+        bucket = self.buckets.get(message_type)
+        if bucket is None:
+            bucket = self.buckets[message_type] = TokenBucket(*MESSAGE_LIMITS.get(message_type, DEFAULT_LIMIT))
+        return bucket
+
+    def check(self, message_type: str):
+        """ "allow", "coalesce" (merge into pending input) or "drop"."""
+        now = time.monotonic()
+        if self.bucket(limit_key(message_type)).take(now):
+            return "allow"
+        if now - self.window_start > OFFENDER_WINDOW_SECONDS:
+            self.window_start = now
+            self.rejected = 0
+        self.rejected += 1
+        return "coalesce" if isinstance(message_type, str) and message_type in COALESCED_TYPES else "drop"
+
+    def take(self, message_type: str):
+        """Spends a token for work dispatched outside check() (flushed coalesced input)."""
+        return self.bucket(limit_key(message_type)).take(time.monotonic())
+
+    def is_offender(self):
+        return self.rejected >= OFFENDER_THRESHOLD
+
+    def cancel(self):
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+
+class RateLimitStats:
+    def __init__(self):
+        self.by_type = {}  # {limit_key: {outcome: count}}
+        self.disconnects = 0
+
+    def count(self, message_type: str, outcome: str):
+        key = limit_key(message_type)
+        counters = self.by_type.get(key)
+        if counters is None:
+            counters = self.by_type[key] = {"allow": 0, "drop": 0, "coalesce": 0}
+        counters[outcome] += 1
+
+    def stats(self):
+        return {
+            "disconnects": self.disconnects,
+            "by_type": {
+                t: {"allowed": c["allow"], "dropped": c["drop"], "coalesced": c["coalesce"]}
+                for t, c in self.by_type.items()
+            }
+        }
@@ -0,0 +1,146 @@
+import os
+import time
+import secrets
+import asyncio
+from collections import deque
+
+# How long a dropped player keeps their seat (score, position, submission) before removal
+SESSION_GRACE_SECONDS = float(os.getenv("SESSION_GRACE_SECONDS", "30"))
+# Reliable messages kept per session for replay on resume
+SESSION_BUFFER_SIZE = int(os.getenv("SESSION_BUFFER_SIZE", "64"))
+
+# High-rate / stale-on-arrival messages are never buffered or replayed
+# (streamed grading_feedback is superseded by the full result in grading_complete)
+UNRELIABLE_TYPES = {"world_update", "video_update", "audio_update", "audio_silence", "video_demand", "grading_feedback"}
+
+
+class Session:
+    def __init__(self, room_code: str, user_id: str, username: str):
+        self.token = secrets.token_urlsafe(24)
+        self.room_code = room_code
+        self.user_id = user_id
+        self.username = username
+        self.seq = 0
+        self.buffer = deque(maxlen=SESSION_BUFFER_SIZE)  # [(seq, message)]
+        self.detached_at = None
+        self.expiry_task = None
+
+    def record(self, message: dict):
+        self.seq += 1
+        stamped = {**message, "seq": self.seq}
+        self.buffer.append((self.seq, stamped))
+        return stamped
+
+    def replay_since(self, last_seq: int):
+        """Messages after last_seq, or None if some of them already fell out of the buffer."""
+        if last_seq >= self.seq:
+            return []
+        if not self.buffer or self.buffer[0][0] > last_seq + 1:
+            return None
+        return [message for seq, message in self.buffer if seq > last_seq]
+
+
+class SessionStore:
+    """
+    Resume tokens for players. A dropped socket detaches the session instead of removing the
+    player; the caller's on_expire(room_code, user_id) runs if nobody resumes within the grace period.
+    """
+    def __init__(self):
+        self.sessions = {}  # {token: Session}
+        self.by_room = {}  # {room_code: {user_id: Session}}
+        self.counters = {"created": 0, "resumed": 0, "expired": 0, "replayed_messages": 0, "full_resyncs": 0}
+
+    def create(self, room_code: str, user_id: str, username: str):
+        session = Session(room_code, user_id, username)
+        self.sessions[session.token] = session
+        self.by_room.setdefault(room_code, {})[user_id] = session
+        self.counters["created"] += 1
+        return session
+
+    def get(self, token: str):
+        return self.sessions.get(token) if token else None
+
+    def record(self, token: str, message: dict):
+        """Stamps a reliable message with the session's next seq and buffers it."""
+        session = self.sessions.get(token)
+        if not session or message.get("type") in UNRELIABLE_TYPES:
+            return message
+        return session.record(message)
+
+    def detached_in_room(self, room_code: str):
+        return [s for s in self.by_room.get(room_code, {}).values() if s.detached_at is not None]
+
+    def detach(self, token: str, on_expire):
+        session = self.sessions.get(token)
+        if not session:
+            return None
+        session.detached_at = time.time()
+        session.expiry_task = asyncio.create_task(self._expire(session, on_expire))
+        return session
+
+    def attach(self, token: str):
+        session = self.sessions.get(token)
+        if not session:
+            return None
+        if session.expiry_task and not session.expiry_task.done():
+            session.expiry_task.cancel()
+        session.expiry_task = None
+        session.detached_at = None
+        self.counters["resumed"] += 1
+        return session
+
+    async def _expire(self, session: Session, on_expire):
+        await asyncio.sleep(SESSION_GRACE_SECONDS)
+        if session.detached_at is None:
+            return
+        self.discard(session.token)
+        self.counters["expired"] += 1
+        await on_expire(session.room_code, session.user_id)
+
+    def discard(self, token: str):
+        session = self.sessions.pop(token, None)
+        if not session:
+            return
+        room = self.by_room.get(session.room_code, {})
+        if room.get(session.user_id) is session:
+            del room[session.user_id]
+        if not room:
+            self.by_room.pop(session.room_code, None)
+        if session.expiry_task and not session.expiry_task.done() and session.expiry_task is not asyncio.current_task():
+            session.expiry_task.cancel()
+
+    def discard_room(self, room_code: str):
+        for session in list(self.by_room.get(room_code, {}).values()):
+            self.discard(session.token)
+
+    def export_room(self, room_code: str):
+        """Serializable sessions of a room, so a peer process can honour the same resume tokens."""
+        return [
+            {
+                "token": s.token,
+                "user_id": s.user_id,
+                "username": s.username,
+                "seq": s.seq,
+                "buffer": [message for _, message in s.buffer],
+            }
+            for s in self.by_room.get(room_code, {}).values()
+        ]
+
+    def import_session(self, room_code: str, data: dict, on_expire):
+        """Registers a session moved from another process, detached until the client resumes here."""
+        session = Session(room_code, data["user_id"], data["username"])
+        session.token = data["token"]
+        session.seq = data["seq"]
+        for message in data.get("buffer", []):
+            session.buffer.append((message["seq"], message))
+        self.sessions[session.token] = session
+        self.by_room.setdefault(room_code, {})[session.user_id] = session
+        self.detach(session.token, on_expire)
+        return session
+
+    def stats(self):
+        return {
+            **self.counters,
+            "active": len(self.sessions),
+            "detached": sum(1 for s in self.sessions.values() if s.detached_at is not None),
+        }
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import asyncio
+
+# Spectators get world_update at this rate instead of the 20 Hz physics tick
+SPECTATOR_WORLD_HZ = float(os.getenv("SPECTATOR_WORLD_HZ", "5"))
+# The one video tier forwarded to spectators (published whenever a room has any)
+SPECTATOR_VIDEO_TIER = "low"
+SPECTATOR_MAX_PER_ROOM = int(os.getenv("SPECTATOR_MAX_PER_ROOM", "500"))
+# A spectator socket that can't take a message within this long just misses it
+SPECTATOR_SEND_TIMEOUT = 2.0
+
+# Room broadcasts spectators receive as-is (everything else is player-only)
+SPECTATOR_EVENTS = {
+    "player_update", "settings_update", "game_starting", "new_question", "round_over", "game_over", "room_closed"
+}
+# Latest of these is replayed to a spectator when they arrive
+REPLAYED_EVENTS = {"player_update", "settings_update"}
+
+
+class SpectatorHub:
+    """
+    Read-only viewers of a room, kept out of the player connection map so they never count as
+    players. Each message is serialized once per room and the same text is written to every
+    spectator socket; world_update is thinned to SPECTATOR_WORLD_HZ.
+    """
+    def __init__(self):
+        self.rooms = {}  # {room_code: set(websocket)}
+        self.room_of = {}  # {websocket: room_code}
+        self.latest = {}  # {room_code: {message type: message}} for REPLAYED_EVENTS and world_update
+        self.world = {}  # {room_code: {"last_sent", "pending", "flush_task"}}
+        self.counters = {"published": 0, "encoded_bytes": 0, "sent": 0, "send_failures": 0, "world_thinned": 0}
+
+    def add(self, room_code: str, websocket):
+        viewers = self.rooms.setdefault(room_code, set())
+        if len(viewers) >= SPECTATOR_MAX_PER_ROOM:
+            return False
+        self.remove(websocket)
+        viewers.add(websocket)
+        self.room_of[websocket] = room_code
+        return True
+
+    def remove(self, websocket):
+        room_code = self.room_of.pop(websocket, None)
+        if room_code is None:
+            return None
+        viewers = self.rooms.get(room_code)
+        if viewers is not None:
+            viewers.discard(websocket)
+            if not viewers:
+                del self.rooms[room_code]
+        return room_code
+
+    def count(self, room_code: str):
+        return len(self.rooms.get(room_code, ()))
+
+    def replay(self, room_code: str):
+        """Cached state messages a newly arrived spectator needs."""
+        return list(self.latest.get(room_code, {}).values())
+
+    async def publish(self, room_code: str, message: dict):
+        if message.get("type") in REPLAYED_EVENTS:
+            self.latest.setdefault(room_code, {})[message["type"]] = message
+        viewers = self.rooms.get(room_code)
+        if not viewers:
+            return
+        text = json.dumps(message)
+        self.counters["published"] += 1
+        self.counters["encoded_bytes"] += len(text)
+        await self._fanout(list(viewers), text)
+
+    async def _fanout(self, viewers, text: str):
+        results = await asyncio.gather(
+            *(asyncio.wait_for(ws.send_text(text), SPECTATOR_SEND_TIMEOUT) for ws in viewers),
+            return_exceptions=True
+        )
+        failures = sum(1 for r in results if isinstance(r, BaseException))
+        self.counters["sent"] += len(results) - failures
+        self.counters["send_failures"] += failures
+
+    async def world_update(self, room_code: str, players: dict):
+        self.latest.setdefault(room_code, {})["world_update"] = {"type": "world_update", "players": players}
+        if not self.rooms.get(room_code):
+            return
+        state = self.world.setdefault(room_code, {"last_sent": 0.0, "pending": None, "flush_task": None})
+        wait = state["last_sent"] + 1.0 / SPECTATOR_WORLD_HZ - time.time()
+        if wait <= 0 and state["flush_task"] is None:
+            state["last_sent"] = time.time()
+            await self.publish(room_code, {"type": "world_update", "players": players})
+            return
+        # Too soon: keep only the newest snapshot and send it when the slot comes up
+        if state["pending"] is not None:
+            self.counters["world_thinned"] += 1
+        state["pending"] = players
+        if state["flush_task"] is None:
+            state["flush_task"] = asyncio.create_task(self._flush_world(room_code, max(0.0, wait)))
+
+    async def _flush_world(self, room_code: str, delay: float):
+        await asyncio.sleep(delay)
+        state = self.world.get(room_code)
+        if not state:
+            return
+        state["flush_task"] = None
+        pending, state["pending"] = state["pending"], None
+        if pending is not None:
+            state["last_sent"] = time.time()
+            await self.publish(room_code, {"type": "world_update", "players": pending})
+
+    def forget(self, room_code: str, farewell: dict = None):
+        """Detaches every spectator of a room; `farewell` (room_closed / migrate) is sent to them first."""
+        viewers = self.rooms.pop(room_code, set())
+        for websocket in viewers:
+            self.room_of.pop(websocket, None)
+        self.latest.pop(room_code, None)
+        state = self.world.pop(room_code, None)
+        if state and state["flush_task"] and not state["flush_task"].done():
+            state["flush_task"].cancel()
+        if farewell and viewers:
+            asyncio.create_task(self._fanout(list(viewers), json.dumps(farewell)))
+
+    def stats(self):
+        return {
+            **self.counters,
+            "spectators": len(self.room_of),
+            "rooms": len(self.rooms),
+        }
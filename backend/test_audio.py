@@ -0,0 +1,74 @@
+import numpy as np
+
+from audio import (
+    mulaw_encode, mulaw_decode, encode_chunk, decode_chunk, negotiate_format, LEGACY_FORMAT,
+    VoiceActivityGate, VAD_HANGOVER_SECONDS
+)
+
+RATE = 48000
+
+
+def noise(amplitude: float, seconds: float = 0.1, seed: int = 0):
+    return (np.random.default_rng(seed).standard_normal(int(RATE * seconds)) * amplitude).astype(np.int16)
+
+
+def voice(seconds: float = 0.1):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16)
+
+
+def test_mulaw_round_trip_error_is_bounded():
+    samples = np.arange(-32768, 32768, 7, dtype=np.int16)
+    decoded = mulaw_decode(mulaw_encode(samples)).astype(np.int32)
+    error = np.abs(decoded - samples.astype(np.int32))
+    # 8-bit companding: ~2% of the amplitude for loud samples, a few LSBs around zero
+    assert np.all(error <= 0.025 * np.abs(samples.astype(np.int32)) + 4)
+
+
+def test_mulaw_chunk_round_trip():
+    samples = (np.sin(np.linspace(0, 20 * np.pi, 4800)) * 12000).astype(np.int16)
+    chunk = encode_chunk(samples, "mulaw")
+    assert len(chunk) < len(encode_chunk(samples, "pcm16")) * 0.6
+    decoded = decode_chunk(chunk, "mulaw")
+    assert len(decoded) == len(samples)
+    assert np.max(np.abs(decoded.astype(np.int32) - samples)) <= 0.025 * 12000 + 4
+
+
+def test_negotiate_format():
+    assert negotiate_format(["opus", "mulaw", "pcm16"], 16000) == ("mulaw", 16000)
+    assert negotiate_format(["opus"], 44100) == (LEGACY_FORMAT[0], 48000)
+    assert negotiate_format(None, None) == (LEGACY_FORMAT[0], 48000)
+
+
+def test_vad_hangover_then_end():
+    gate = VoiceActivityGate()
+    now = 1000.0
+    for i in range(10):
+        assert gate.check("ROOM", "u1", noise(30, seed=i), RATE, now + i * 0.1) == "silent"
+    now += 1.0
+
+    assert gate.check("ROOM", "u1", voice(), RATE, now) == "speech"
+    # Trailing silence is forwarded for the hangover, then one "end", then dropped
+    assert gate.check("ROOM", "u1", noise(30), RATE, now + VAD_HANGOVER_SECONDS / 2) == "hangover"
+    assert gate.check("ROOM", "u1", noise(30), RATE, now + VAD_HANGOVER_SECONDS) == "hangover"
+    assert gate.check("ROOM", "u1", noise(30), RATE, now + VAD_HANGOVER_SECONDS + 0.1) == "end"
+    assert gate.check("ROOM", "u1", noise(30), RATE, now + VAD_HANGOVER_SECONDS + 0.2) == "silent"
+
+    # Speech inside the hangover restarts it
+    assert gate.check("ROOM", "u1", voice(), RATE, now + 2.0) == "speech"
+    assert gate.check("ROOM", "u1", noise(30), RATE, now + 2.3) == "hangover"
+    assert gate.check("ROOM", "u1", voice(), RATE, now + 2.35) == "speech"
+    assert gate.check("ROOM", "u1", noise(30), RATE, now + 2.35 + VAD_HANGOVER_SECONDS) == "hangover"
+
+
+def test_vad_learns_a_noisy_floor():
+    gate = VoiceActivityGate()
+    # Steady background louder than the initial floor: forwarded at first (it looks like speech,
+    # so the floor rises slowly), learned and gated within ~30 s
+    results = [gate.check("ROOM", "u1", noise(600, seed=i), RATE, 1000.0 + i * 0.1) for i in range(300)]
+    assert results[0] == "speech"
+    assert results[-1] == "silent"
+    assert gate.noise_level_db("ROOM", "u1") > -40
+    assert gate.check("ROOM", "u1", voice(), RATE, 1100.0) == "speech"
+    # Senders are tracked independently
+    assert gate.check("ROOM", "u2", noise(30), RATE, 1100.0) == "silent"
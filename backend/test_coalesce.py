@@ -0,0 +1,66 @@
+import asyncio
+
+from coalesce import ControlPlaneCoalescer
+
+
+def test_burst_becomes_one_flush_per_room_in_mark_order():
+    flushed = []
+
+    async def flush(room_code, kinds):
+        flushed.append((room_code, kinds))
+
+    async def scenario():
+        coalescer = ControlPlaneCoalescer(flush, window=lambda: 0.01)
+        for _ in range(50):
+            coalescer.mark("BBBB", "players")
+            coalescer.mark("AAAA", "players")
+        coalescer.mark("AAAA", "settings")
+        coalescer.mark(None, "players")
+        await asyncio.sleep(0.05)
+        return coalescer
+
+    coalescer = asyncio.run(scenario())
+    assert flushed == [("BBBB", {"players"}), ("AAAA", {"players", "settings"})]
+    assert coalescer.counters == {"marked": 101, "flushes": 2, "messages": 3}
+    assert not coalescer.tasks and not coalescer.dirty
+
+
+def test_marks_during_a_flush_go_out_in_the_next_one():
+    flushed = []
+
+    async def scenario():
+        coalescer = None
+
+        async def flush(room_code, kinds):
+            flushed.append(kinds)
+            if len(flushed) == 1:
+                coalescer.mark(room_code, "video_demand")
+                await asyncio.sleep(0.02)
+
+        coalescer = ControlPlaneCoalescer(flush, window=lambda: 0.01)
+        coalescer.mark("AAAA", "players")
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert flushed == [{"players"}, {"video_demand"}]
+
+
+def test_forget_cancels_and_failed_flush_does_not_stick():
+    flushed = []
+
+    async def flush(room_code, kinds):
+        flushed.append((room_code, kinds))
+        if room_code == "BAD":
+            raise RuntimeError("broadcast failed")
+
+    async def scenario():
+        coalescer = ControlPlaneCoalescer(flush, window=lambda: 0.01)
+        coalescer.mark("GONE", "players")
+        coalescer.forget("GONE")
+        coalescer.mark("BAD", "players")
+        await asyncio.sleep(0.03)
+        coalescer.mark("BAD", "settings")
+        await asyncio.sleep(0.03)
+
+    asyncio.run(scenario())
+    assert flushed == [("BAD", {"players"}), ("BAD", {"settings"})]
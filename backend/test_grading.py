@@ -0,0 +1,59 @@
+import json
+import random
+
+from grading import FeedbackStreamParser
+
+FEEDBACKS = [
+    "Plain feedback.",
+    'Quotes "inside", a backslash \\ and a slash / here',
+    "Line one\nLine two\tindented\r\n",
+    "Accents: café, naïve",
+    "Emoji 👍 and 🎉 in the middle",
+    "",
+]
+
+
+def stream(text: str, sizes):
+    parser = FeedbackStreamParser()
+    scores, deltas = [], []
+    start = 0
+    for size in sizes:
+        score, delta = parser.feed(text[start:start + size])
+        start += size
+        if score is not None:
+            scores.append(score)
+        deltas.append(delta)
+    return parser, scores, "".join(deltas)
+
+
+def test_feedback_survives_every_chunking():
+    rng = random.Random(40)
+    for feedback in FEEDBACKS:
+        for ensure_ascii in (True, False):
+            document = json.dumps({"score": 87, "feedback": feedback}, ensure_ascii=ensure_ascii)
+            chunkings = [[1] * len(document), [len(document)]]
+            chunkings += [[split, len(document) - split] for split in range(1, len(document))]
+            chunkings += [[rng.randint(1, 6) for _ in range(len(document))] for _ in range(20)]
+            for sizes in chunkings:
+                parser, scores, text = stream(document, sizes)
+                assert scores == [87]
+                assert text == feedback, (document, sizes)
+                assert parser.result() == {"score": 87, "feedback": feedback}
+
+
+def test_score_is_reported_once_its_digits_end():
+    parser = FeedbackStreamParser()
+    assert parser.feed('{"score": 9') == (None, "")
+    assert parser.feed('2, "feedback": "Go') == (92, "Go")
+    assert parser.feed('od"}') == (None, "od")
+
+
+def test_unpaired_surrogates_become_replacement_characters():
+    parser, _, text = stream('{"score": 50, "feedback": "a\\ud83db\\ude00c\\ud83d"}', [5] * 20)
+    assert text == "a\ufffdb\ufffdc\ufffd"  # encodable as UTF-8, unlike lone surrogates
+
+
+def test_truncated_stream_keeps_what_was_shown():
+    parser, scores, text = stream('{"score": 61, "feedback": "Good start but', [7] * 10)
+    assert scores == [61]
+    assert parser.result() == {"score": 61, "feedback": text}
@@ -0,0 +1,73 @@
+import random
+import bisect
+import asyncio
+
+from leaderboard import IndexableSkipList, GlobalLeaderboard
+
+
+def test_rank_and_slice_match_a_sorted_list():
+    random.seed(35)
+    skiplist = IndexableSkipList()
+    reference = []
+    for _ in range(3000):
+        value = (random.randint(-50, 0), f"player{random.randint(0, 300)}")
+        if reference and random.random() < 0.3:
+            victim = random.choice(reference)
+            assert skiplist.remove(victim)
+            reference.remove(victim)
+        elif value not in reference:
+            skiplist.insert(value)
+            bisect.insort(reference, value)
+        assert len(skiplist) == len(reference)
+
+    for position, value in enumerate(reference):
+        assert skiplist.rank(value) == position
+    for start in range(0, len(reference) + 5, 7):
+        for count in (0, 1, 10, 100):
+            assert skiplist.slice(start, count) == reference[start:start + count]
+
+
+def test_missing_values():
+    skiplist = IndexableSkipList()
+    assert skiplist.rank((0, "nobody")) is None
+    assert skiplist.slice(0, 10) == []
+    assert not skiplist.remove((0, "nobody"))
+
+    skiplist.insert((-10, "alice"))
+    assert skiplist.rank((-10, "bob")) is None
+    assert not skiplist.remove((-5, "alice"))
+    assert skiplist.slice(1, 10) == []
+
+
+def test_processes_sharing_the_file_add_up(tmp_path):
+    # A draining process and its replacement both record rounds for the same player
+    path = str(tmp_path / "leaderboard.db")
+    old, new = GlobalLeaderboard(path), GlobalLeaderboard(path)
+    old.record_round([("Alice", 80)])
+    new.record_round([("alice", 50), ("Bob", 10)])
+    assert new.rank_of("Alice")["score"] == 130
+    assert new.rank_of("Alice")["rounds_played"] == 2
+    assert new.rank_of("Alice")["best_round"] == 80
+    assert [row["username"] for row in new.top()] == ["alice", "Bob"]
+
+    reloaded = GlobalLeaderboard(path)
+    assert (reloaded.rank_of("alice")["score"], reloaded.rank_of("alice")["rounds_played"]) == (130, 2)
+
+
+def test_writer_task_merges_rounds_and_picks_up_other_writers(tmp_path):
+    path = str(tmp_path / "leaderboard.db")
+
+    async def scenario():
+        other, board = GlobalLeaderboard(path), GlobalLeaderboard(path)
+        other.record_round([("Alice", 40)])  # Through its own writer task
+        for score in (10, 20, 30):
+            board.record_round([("Alice", score)])
+        assert board.rank_of("Alice")["score"] == 60  # Shown before it is written
+        await asyncio.sleep(0.2)
+        assert board.rank_of("Alice")["score"] == 100
+        assert not board.unwritten
+        board.writer_task.cancel()
+        other.writer_task.cancel()
+
+    asyncio.run(scenario())
+    assert GlobalLeaderboard(path).rank_of("Alice")["rounds_played"] == 4
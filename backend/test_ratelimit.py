@@ -0,0 +1,40 @@
+from ratelimit import TokenBucket, ConnectionLimiter, limit_key, MESSAGE_LIMITS
+
+
+def test_bucket_burst_then_refill():
+    bucket = TokenBucket(rate=20, capacity=40)
+    start = bucket.updated
+    assert all(bucket.take(start) for _ in range(40))
+    assert not bucket.take(start)
+    assert 0.0 < bucket.wait_time() <= 1 / 20
+
+    # Half a second refills 10 tokens
+    assert sum(bucket.take(start + 0.5) for _ in range(15)) == 10
+    # Idle time never builds more than the burst
+    assert sum(bucket.take(start + 100) for _ in range(100)) == 40
+
+
+def test_limiter_coalesces_input_and_drops_the_rest():
+    limiter = ConnectionLimiter()
+    burst = MESSAGE_LIMITS["input"][1]
+    outcomes = [limiter.check("keydown") for _ in range(burst + 5)]
+    assert outcomes[:burst] == ["allow"] * burst
+    assert set(outcomes[burst:]) == {"coalesce"}
+    # keydown and keyup share one bucket; flushing spends from it as well
+    assert limiter.check("keyup") == "coalesce"
+    assert not limiter.take("keydown")
+
+    submits = [limiter.check("submit") for _ in range(MESSAGE_LIMITS["submit"][1] + 1)]
+    assert submits[-1] == "drop"
+    assert limiter.rejected == 5 + 1 + 1
+
+
+def test_unknown_and_malformed_types_share_the_default_bucket():
+    assert limit_key("keyup") == "input"
+    assert limit_key("definitely_not_a_type") == "other"
+    assert limit_key(None) == "other"
+    assert limit_key(["keydown"]) == "other"
+
+    limiter = ConnectionLimiter()
+    assert limiter.check({"a": 1}) == "allow"
+    assert set(limiter.buckets) == {"other"}
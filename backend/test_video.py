@@ -0,0 +1,92 @@
+import video
+from video import (
+    FrameGovernor, VIDEO_TIERS, MIN_SENDER_FPS, FRAME_INTERVAL_SLACK, DUPLICATE_REFRESH_SECONDS, PUBLISH_TIMEOUT
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_room_stays_within_the_frame_budget():
+    governor = FrameGovernor(room_frame_budget=600)
+    for room_size in range(2, 40):
+        for tiers in (["high"], ["low", "high"], ["low", "mid", "high"]):
+            per_sender = [governor.sender_fps(tier, room_size, len(tiers)) for tier in tiers]
+            assert all(fps <= VIDEO_TIERS[tier]["fps"] for fps, tier in zip(per_sender, tiers))
+            if min(per_sender) > MIN_SENDER_FPS:
+                # Every sender's tiers together, each frame forwarded to every other player
+                assert sum(per_sender) * room_size * (room_size - 1) <= 600 + 1e-6
+
+
+def test_small_rooms_get_the_full_tier_rate_and_shedding_scales_it():
+    governor = FrameGovernor(room_frame_budget=600)
+    assert governor.sender_fps("high", 4, 3) == VIDEO_TIERS["high"]["fps"]
+    # Simulcasting shares one sender's budget instead of multiplying it
+    assert governor.sender_fps("high", 10, 3) == 600 / (10 * 9 * 3)
+    governor.fps_scale = 0.5
+    assert governor.sender_fps("high", 4, 3) == VIDEO_TIERS["high"]["fps"] * 0.5
+    assert governor.sender_fps("low", 200) == MIN_SENDER_FPS
+
+
+def test_duplicates_dropped_and_bursts_coalesced():
+    governor = FrameGovernor(room_frame_budget=600)
+    assert governor.offer("ROOM", "u1", "high", "frame-a", 4) == ("forward", None)
+    assert governor.offer("ROOM", "u1", "high", "frame-a", 4) == ("drop", None)
+
+    action, delay = governor.offer("ROOM", "u1", "high", "frame-b", 4)
+    assert action == "schedule"
+    assert 0 < delay <= FRAME_INTERVAL_SLACK / VIDEO_TIERS["high"]["fps"]
+    assert governor.offer("ROOM", "u1", "high", "frame-c", 4) == ("held", None)
+    # Tiers are paced independently
+    assert governor.offer("ROOM", "u1", "low", "frame-c-low", 4) == ("forward", None)
+
+    assert governor.take_pending("ROOM", "u1", "high") == "frame-c"
+    assert governor.take_pending("ROOM", "u1", "high") is None
+    assert governor.counters["dropped_coalesced"] == 1
+    assert governor.counters["dropped_duplicate"] == 1
+
+
+def test_early_frames_dropped_when_not_holding():
+    governor = FrameGovernor(room_frame_budget=600)
+    governor.flush_held = False
+    assert governor.offer("ROOM", "u1", "high", "frame-a", 4) == ("forward", None)
+    assert governor.offer("ROOM", "u1", "high", "frame-b", 4) == ("drop", None)
+
+
+
+def test_static_camera_reaches_late_joiners_and_refreshes(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(video, "time", clock)
+    governor = FrameGovernor(room_frame_budget=600)
+    viewers = frozenset({"a"})
+    assert governor.offer("ROOM", "u1", "low", "static", 3, recipients=viewers) == ("forward", None)
+    clock.now += 1
+    assert governor.offer("ROOM", "u1", "low", "static", 3, recipients=viewers) == ("drop", None)
+
+    # Viewer B joins (or resumes on a new socket): the unchanged frame goes out once more
+    viewers = frozenset({"a", "b"})
+    clock.now += 0.5
+    assert governor.offer("ROOM", "u1", "low", "static", 3, recipients=viewers) == ("forward", None)
+    clock.now += 0.5
+    assert governor.offer("ROOM", "u1", "low", "static", 3, recipients=viewers) == ("drop", None)
+
+    # Nothing changed, but the refresh is due
+    clock.now += DUPLICATE_REFRESH_SECONDS
+    assert governor.offer("ROOM", "u1", "low", "static", 3, recipients=viewers) == ("forward", None)
+
+
+def test_tier_going_unpublished_forgets_its_last_frame(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(video, "time", clock)
+    monkeypatch.setattr(video, "DUPLICATE_REFRESH_SECONDS", 60.0) # Only the publish gap matters here
+    governor = FrameGovernor(room_frame_budget=600)
+    governor.offer("ROOM", "u1", "high", "static", 3, recipients=frozenset())
+    clock.now += 1
+    assert governor.offer("ROOM", "u1", "high", "static", 3, recipients=frozenset()) == ("drop", None)
+    clock.now += PUBLISH_TIMEOUT + 0.5
+    assert governor.offer("ROOM", "u1", "high", "static", 3, recipients=frozenset()) == ("forward", None)
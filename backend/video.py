@@ -0,0 +1,237 @@
+import os
+import time
+import hashlib
+
+# Simulcast tiers published by VideoBroadcaster, lowest first.
+# Each recipient subscribes to one tier per sender depending on how it renders them:
+#   "high" - focused view (coffee chat partner)
+#   "mid"  - medium tiles (results podium)
+#   "low"  - avatar faces / thumbnails
+#   "off"  - not on screen, nothing is forwarded
+VIDEO_TIERS = {
+    "low": {"size": 120, "fps": 3, "quality": 0.5},
+    "mid": {"size": 180, "fps": 7.5, "quality": 0.45},
+    "high": {"size": 360, "fps": 15, "quality": 0.4},
+}
+TIER_ORDER = ["low", "mid", "high"]
+
+# Frames without a "tier" field come from older clients that only send the 360px stream
+LEGACY_TIER = "high"
+# Tier used for recipients that never sent a video_subscribe
+DEFAULT_TIER = os.getenv("VIDEO_DEFAULT_TIER", "low")
+# A tier counts as published if a frame for it arrived within this many seconds
+PUBLISH_TIMEOUT = 2.0
+
+# Forwarded frames per second a whole room may cost (sender fps x recipients, summed over senders)
+ROOM_FRAME_BUDGET = float(os.getenv("VIDEO_ROOM_FRAME_BUDGET", "600"))
+# Never throttle a sender below this rate
+MIN_SENDER_FPS = 1.0
+# Slack on the send interval so normal capture jitter isn't mistaken for a burst
+FRAME_INTERVAL_SLACK = 0.9
+# An unchanged frame is still re-sent this often (a static camera's tile keeps refreshing)
+DUPLICATE_REFRESH_SECONDS = 2.0
+
+
+def normalize_tier(tier):
+    if not isinstance(tier, str):
+        return None
+    tier = tier.lower()
+    if tier == "off" or tier in VIDEO_TIERS:
+        return tier
+    return None
+
+
+class VideoRelay:
+    def __init__(self):
+        self.published = {}  # {(room_code, user_id): {tier: last_frame_time}}
+        self.demand = {}  # {(room_code, user_id): [tiers]} last demand sent to each publisher
+        self.tier_cap = None  # Highest tier anyone gets while the server sheds load
+
+    def wanted_tier(self, subs: dict, sender_id: str):
+        # subs is the "video_subs" entry of a connection: {"default": tier, "players": {user_id: tier}}
+        if not subs:
+            tier = DEFAULT_TIER
+        else:
+            tier = subs.get("players", {}).get(sender_id) or subs.get("default") or DEFAULT_TIER
+        if self.tier_cap and tier != "off" and TIER_ORDER.index(tier) > TIER_ORDER.index(self.tier_cap):
+            return self.tier_cap
+        return tier
+
+    def published_tiers(self, room_code: str, sender_id: str):
+        now = time.time()
+        tiers = self.published.get((room_code, sender_id), {})
+        return [t for t in TIER_ORDER if now - tiers.get(t, 0) <= PUBLISH_TIMEOUT]
+
+    def resolve_tier(self, published: list, wanted: str):
+        """Best published tier not above what the recipient asked for (or the lowest one)."""
+        if wanted == "off" or not published:
+            return None
+        limit = TIER_ORDER.index(wanted)
+        best = None
+        for tier in published:
+            if TIER_ORDER.index(tier) <= limit:
+                best = tier
+        return best or published[0]
+
+    def mark_published(self, room_code: str, sender_id: str, tier: str):
+        self.published.setdefault((room_code, sender_id), {})[tier] = time.time()
+
+    def route(self, room_code: str, sender_id: str, tier: str, connections: dict, allowed=None):
+        """
+        Returns the connections that should get a frame of `tier` from `sender_id`.
+        `connections` is the ConnectionManager's {websocket: data} map.
+        `allowed` optionally restricts recipients to a set of user_ids (e.g. players nearby).
+        """
+        published = self.published_tiers(room_code, sender_id)
+
+        targets = []
+        for connection, data in connections.items():
+            if data.get("room_code") != room_code or data.get("user_id") == sender_id:
+                continue
+            if allowed is not None and data.get("user_id") not in allowed:
+                continue
+            wanted = self.wanted_tier(data.get("video_subs"), sender_id)
+            if self.resolve_tier(published, wanted) == tier:
+                targets.append(connection)
+        return targets
+
+    def compute_demand(self, room_code: str, connections: dict, extra_tiers=()):
+        """
+        Returns {user_id: [tiers]} for publishers whose set of subscribed tiers changed,
+        so they can stop encoding and uploading tiers nobody watches.
+        `extra_tiers` are wanted from every publisher regardless (e.g. for spectators).
+        """
+        members = [d for d in connections.values() if d.get("room_code") == room_code and d.get("user_id")]
+        changed = {}
+        for sender in members:
+            sender_id = sender["user_id"]
+            wanted = set(extra_tiers)
+            for viewer in members:
+                if viewer["user_id"] == sender_id:
+                    continue
+                tier = self.wanted_tier(viewer.get("video_subs"), sender_id)
+                if tier != "off":
+                    wanted.add(tier)
+            tiers = [t for t in TIER_ORDER if t in wanted]
+            if self.demand.get((room_code, sender_id)) != tiers:
+                self.demand[(room_code, sender_id)] = tiers
+                changed[sender_id] = tiers
+        return changed
+
+    def forget(self, room_code: str, user_id: str = None):
+        for store in (self.published, self.demand):
+            for key in list(store.keys()):
+                if key[0] == room_code and (user_id is None or key[1] == user_id):
+                    del store[key]
+
+
+class FrameGovernor:
+    """
+    Per-sender rate limiter for the video relay.
+    - drops frames identical to the last forwarded one (static camera, covered lens, paused tab),
+      unless the recipients changed since (late joiners need one copy) or the refresh is due
+    - caps each sender's fps so the room stays within ROOM_FRAME_BUDGET; a sender's share is
+      split across the tiers it publishes, so simulcasting doesn't multiply its cost
+    - coalesces bursts: a frame arriving too early is held, later ones replace it (latest wins)
+    """
+    def __init__(self, room_frame_budget=ROOM_FRAME_BUDGET):
+        self.room_frame_budget = room_frame_budget
+        self.fps_scale = 1.0  # < 1 while the server sheds load
+        self.flush_held = True  # False: frames arriving early are dropped, not sent later
+        # {(room_code, user_id, tier): {"last_sent", "last_hash", "last_recipients", "last_offered", "pending", "flush_scheduled"}}
+        self.senders = {}
+        self.counters = {
+            "received": 0,
+            "forwarded": 0,
+            "dropped_duplicate": 0,
+            "dropped_coalesced": 0,
+        }
+
+    def sender_fps(self, tier: str, room_size: int, tier_count: int = 1):
+        tier_fps = VIDEO_TIERS.get(tier, VIDEO_TIERS[LEGACY_TIER])["fps"]
+        fanout = room_size * max(1, room_size - 1) * max(1, tier_count)
+        return max(MIN_SENDER_FPS, min(tier_fps, self.room_frame_budget / fanout) * self.fps_scale)
+
+    def offer(self, room_code: str, user_id: str, tier: str, frame: str, room_size: int, tier_count: int = 1,
+              recipients=None):
+        """
+        Returns ("forward", None) if the frame can go out now, ("schedule", delay) if it was held
+        and the caller must call take_pending() after `delay` seconds, ("held", None) if it replaced
+        a frame that is already scheduled, or ("drop", None).
+        `recipients` is any hashable identifying who the frame would be routed to right now.
+        """
+        self.counters["received"] += 1
+        key = (room_code, user_id, tier)
+        state = self.senders.setdefault(key, {
+            "last_sent": 0.0, "last_hash": None, "last_recipients": None, "last_offered": 0.0,
+            "pending": None, "flush_scheduled": False
+        })
+        now = time.time()
+        if now - state["last_offered"] > PUBLISH_TIMEOUT:
+            state["last_hash"] = None # The tier went unpublished: whatever was last sent is stale
+        state["last_offered"] = now
+
+        frame_hash = hashlib.blake2b((frame or "").encode(), digest_size=8).digest()
+        duplicate = (
+            frame_hash == state["last_hash"]
+            and recipients == state["last_recipients"]
+            and now - state["last_sent"] < DUPLICATE_REFRESH_SECONDS
+        )
+        if duplicate:
+            # Identical content - nothing new to show. Also discard an older pending frame.
+            if state["pending"] is not None:
+                state["pending"] = None
+                self.counters["dropped_coalesced"] += 1
+            self.counters["dropped_duplicate"] += 1
+            return "drop", None
+
+        interval = FRAME_INTERVAL_SLACK / self.sender_fps(tier, room_size, tier_count)
+        wait = state["last_sent"] + interval - now
+        if wait <= 0 and not state["flush_scheduled"]:
+            self._mark_sent(state, frame_hash, recipients)
+            return "forward", None
+
+        if not self.flush_held and not state["flush_scheduled"]:
+            self.counters["dropped_coalesced"] += 1
+            return "drop", None
+        if state["pending"] is not None:
+            self.counters["dropped_coalesced"] += 1
+        state["pending"] = (frame, frame_hash)
+        if state["flush_scheduled"]:
+            return "held", None
+        state["flush_scheduled"] = True
+        return "schedule", max(0.0, wait)
+
+    def take_pending(self, room_code: str, user_id: str, tier: str, recipients=None):
+        """Returns the latest held frame (or None) once its send slot has come up."""
+        state = self.senders.get((room_code, user_id, tier))
+        if not state:
+            return None
+        state["flush_scheduled"] = False
+        pending, state["pending"] = state["pending"], None
+        if pending is None:
+            return None
+        frame, frame_hash = pending
+        self._mark_sent(state, frame_hash, recipients)
+        return frame
+
+    def _mark_sent(self, state, frame_hash, recipients):
+        state["last_sent"] = time.time()
+        state["last_hash"] = frame_hash
+        state["last_recipients"] = recipients
+        self.counters["forwarded"] += 1
+
+    def stats(self):
+        received = self.counters["received"]
+        dropped = self.counters["dropped_duplicate"] + self.counters["dropped_coalesced"]
+        return {
+            **self.counters,
+            "dropped": dropped,
+            "drop_ratio": round(dropped / received, 3) if received else 0.0,
+            "tracked_streams": len(self.senders),
+        }
+
+    def forget(self, room_code: str, user_id: str = None):
+        for key in list(self.senders.keys()):
+            if key[0] == room_code and (user_id is None or key[1] == user_id):
+                del self.senders[key]
@@ -9,6 +9,7 @@ import TitleImage from "@/assets/title.png";
 import CreateRoomImage from "@/assets/createroom1.png";
 import JoinFriendImage from "@/assets/joinfriend.png";
 import SoloQueueImage from "@/assets/soloqueue1.png";
+import { socketClient } from "@/lib/socket";
 
 export default function Home() {
   const router = useRouter();
@@ -17,6 +18,7 @@ export default function Home() {
   const [soloName, setSoloName] = useState("");
   const [roomCode, setRoomCode] = useState("");
   const [showContent, setShowContent] = useState(false);
+  const [searching, setSearching] = useState(false);
   
   useEffect(() => {
       const timer = setTimeout(() => {
@@ -38,12 +40,30 @@ export default function Home() {
     router.push(`/preflight?code=${roomCode}`);
   };
 
+  // Solo queue: wait for the server to match us, then join the room it opened
+  useEffect(() => {
+      if (!searching) return;
+      const handleMatch = (e: CustomEvent) => {
+          if (e.detail?.type === "match_found") {
+              setSearching(false);
+              router.push(`/preflight?code=${e.detail.room_code}`);
+          }
+      };
+      window.addEventListener("game_socket_message" as any, handleMatch);
+      return () => window.removeEventListener("game_socket_message" as any, handleMatch);
+  }, [searching, router]);
+
   const handleSolo = () => {
+      if (searching) {
+          socketClient.leaveQueue();
+          setSearching(false);
+          return;
+      }
       if (!soloName.trim()) return;
-      // Solo queue logic: For now, acts like creating a private room
-      const code = Math.random().toString(36).substring(2, 8).toUpperCase();
       localStorage.setItem("interview-royale-name", soloName);
-      router.push(`/preflight?code=${code}&create=true`);
+      socketClient.connect();
+      socketClient.joinQueue(soloName);
+      setSearching(true);
   };
 
   return (
@@ -259,7 +279,7 @@ export default function Home() {
                                 letterSpacing: "-.50px", lineHeight: "1.00"
                             }}
                          >
-                             Join
+                             {searching ? "Searching... (cancel)" : "Join"}
                          </button>
                      </div>
                 </div>
@@ -85,9 +85,17 @@ export default function LobbyPage() {
       useGameStore.getState().setMe(myName);
     }
 
-    // Connect & Join
+    // Connect & Join (?spectate=1 watches instead of taking a seat)
     socketClient.connect();
 
+    const spectating = new URLSearchParams(window.location.search).get("spectate") === "1";
+    if (spectating) {
+      socketClient.spectate(code as string);
+      return () => {
+        mounted = false;
+      };
+    }
+
     if (myName) {
       socketClient.join(myName);
     }
@@ -64,6 +64,14 @@ export default function ResultsPage() {
 
     const myScore = leaderboard.find(l => l.username === me?.name)?.score || 0;
 
+    // Video: medium tiles for the podium, nothing for everyone else (the list has no video)
+    const podiumIds = top3.map(e => e.playerObj?.id).filter((id): id is string => !!id && id !== me?.id);
+    const podiumKey = podiumIds.join(",");
+    useEffect(() => {
+        socketClient.subscribeVideo("off", Object.fromEntries(podiumIds.map(id => [id, "mid"])));
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [podiumKey]);
+
     return (
         <main 
             className="min-h-screen flex flex-col items-center justify-center p-8 bg-white text-zinc-900 font-sans overflow-hidden"
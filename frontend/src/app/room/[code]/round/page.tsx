@@ -49,6 +49,11 @@ export default function RoundPage() {
     }
   }, [phase, code, router]);
 
+  // Video: small avatars in the competitors row (IntermissionCanvas takes over once submitted)
+  useEffect(() => {
+    if (!hasSubmitted) socketClient.subscribeVideo("low");
+  }, [hasSubmitted]);
+
   // Reset input when question changes
   useEffect(() => {
       setTextAnswer((question as any)?.starter_code || "");
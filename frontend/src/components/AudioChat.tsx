@@ -40,6 +40,60 @@ function base64ToFloat32(base64: string): Float32Array {
     return float32;
 }
 
+// --- Codec (must match backend/audio.py) ---
+// mu-law companded 8-bit samples at a speech sample rate, ~6x smaller than 48 kHz Int16
+const MULAW_MU = 255;
+const SEND_CODEC = "mulaw";
+const SEND_SAMPLE_RATE = 16000;
+
+function mulawEncode(input: Float32Array): Uint8Array {
+    const out = new Uint8Array(input.length);
+    const norm = Math.log1p(MULAW_MU);
+    for (let i = 0; i < input.length; i++) {
+        const x = Math.max(-1, Math.min(1, input[i]));
+        const y = Math.sign(x) * Math.log1p(MULAW_MU * Math.abs(x)) / norm;
+        out[i] = Math.round((y + 1) * 127.5);
+    }
+    return out;
+}
+
+function mulawDecode(input: Uint8Array): Float32Array {
+    const out = new Float32Array(input.length);
+    const norm = Math.log1p(MULAW_MU);
+    for (let i = 0; i < input.length; i++) {
+        const y = input[i] / 127.5 - 1;
+        out[i] = Math.sign(y) * Math.expm1(Math.abs(y) * norm) / MULAW_MU;
+    }
+    return out;
+}
+
+// Average groups of `factor` samples (cheap anti-alias + decimate)
+function downsample(input: Float32Array, factor: number): Float32Array {
+    const out = new Float32Array(Math.floor(input.length / factor));
+    for (let i = 0; i < out.length; i++) {
+        let sum = 0;
+        for (let j = 0; j < factor; j++) sum += input[i * factor + j];
+        out[i] = sum / factor;
+    }
+    return out;
+}
+
+function base64ToBytes(base64: string): Uint8Array {
+    const binaryString = window.atob(base64);
+    const bytes = new Uint8Array(binaryString.length);
+    for (let i = 0; i < binaryString.length; i++) {
+        bytes[i] = binaryString.charCodeAt(i);
+    }
+    return bytes;
+}
+
+function bytesToBase64(bytes: Uint8Array): string {
+    let binary = '';
+    for (let i = 0; i < bytes.byteLength; i++) {
+        binary += String.fromCharCode(bytes[i]);
+    }
+    return window.btoa(binary);
+}
 
 interface AudioChatProps {
     visualState: Record<string, { x: number, y: number }>;
@@ -65,6 +119,9 @@ export function AudioChat({ visualState, onVolumeChange, privatePeerId }: AudioC
         privatePeerIdRef.current = privatePeerId || null;
     }, [privatePeerId]);
 
+    // Negotiated send codec ("pcm16" until the server confirms)
+    const codecRef = useRef<string>("pcm16");
+
     // Remote Peers State
     // access via refs to avoid closure staleness in message handlers
     const peerNodes = useRef<Record<string, { gain: GainNode, nextTime: number } | undefined>>({});
@@ -108,29 +165,31 @@ export function AudioChat({ visualState, onVolumeChange, privatePeerId }: AudioC
                 const processor = ctx.createScriptProcessor(16384, 1, 1);
                 processorRef.current = processor;
 
+                // Offer the compressed codec; server answers with "audio_codec" (re-offered on every reconnect)
+                socketClient.offerAudioCodecs([SEND_CODEC, "pcm16"], SEND_SAMPLE_RATE);
+
                 processor.onaudioprocess = (e) => {
                     if (!socketClient) return;
 
                     const inputData = e.inputBuffer.getChannelData(0);
 
-                    // Convert to Int16 PCM
-                    // Compressor handles gaining, so we just clip safely
-                    const buffer = new ArrayBuffer(inputData.length * 2);
-                    const view = new DataView(buffer);
-
-                    for (let i = 0; i < inputData.length; i++) {
-                        const s = Math.max(-1, Math.min(1, inputData[i])); // Hard clip safe
-                        view.setInt16(i * 2, s < 0 ? s * 0x8000 : s * 0x7FFF, true);
-                    }
-
-                    // Base64 encode
-                    let binary = '';
-                    const bytes = new Uint8Array(buffer);
-                    const len = bytes.byteLength;
-                    for (let i = 0; i < len; i++) {
-                        binary += String.fromCharCode(bytes[i]);
+                    let base64: string;
+                    if (codecRef.current === SEND_CODEC) {
+                        // Negotiated: mu-law at speech rate
+                        const factor = Math.round(ctx.sampleRate / SEND_SAMPLE_RATE);
+                        base64 = bytesToBase64(mulawEncode(downsample(inputData, factor)));
+                    } else {
+                        // Fallback: raw Int16 PCM
+                        // Compressor handles gaining, so we just clip safely
+                        const buffer = new ArrayBuffer(inputData.length * 2);
+                        const view = new DataView(buffer);
+
+                        for (let i = 0; i < inputData.length; i++) {
+                            const s = Math.max(-1, Math.min(1, inputData[i])); // Hard clip safe
+                            view.setInt16(i * 2, s < 0 ? s * 0x8000 : s * 0x7FFF, true);
+                        }
+                        base64 = bytesToBase64(new Uint8Array(buffer));
                     }
-                    const base64 = window.btoa(binary);
 
                     const payload: any = { chunk: base64 };
                     if (privatePeerIdRef.current) {
@@ -168,6 +227,10 @@ export function AudioChat({ visualState, onVolumeChange, privatePeerId }: AudioC
     useEffect(() => {
         const handleAudioMsg = (e: CustomEvent) => {
             const data = e.detail;
+            if (data.type === "audio_codec") {
+                codecRef.current = data.codec;
+                return;
+            }
             if (data.type !== "audio_update") return;
             if (data.id === me?.id) return; // Ignore self
 
@@ -180,10 +243,12 @@ export function AudioChat({ visualState, onVolumeChange, privatePeerId }: AudioC
             if (!ctx || ctx.state === "closed") return;
 
             // Decode Chunk
-            const float32 = base64ToFloat32(data.chunk);
+            const float32 = data.codec === "mulaw"
+                ? mulawDecode(base64ToBytes(data.chunk))
+                : base64ToFloat32(data.chunk);
 
-            // Create Buffer
-            const buffer = ctx.createBuffer(1, float32.length, 48000);
+            // Create Buffer (WebAudio resamples to the context rate on playback)
+            const buffer = ctx.createBuffer(1, float32.length, data.sample_rate || 48000);
             buffer.copyToChannel(float32 as any, 0);
 
             // Get or Create Peer Node
@@ -12,6 +12,9 @@ import { cn } from "@/lib/utils";
 import { LeaderboardOverlay } from "./LeaderboardOverlay";
 
 // Linear interpolation helper
+// Players further than this beyond the screen edge get no video (margin so walk-ins already have a frame)
+const OFFSCREEN_MARGIN = 300;
+
 const lerp = (start: number, end: number, t: number) => {
     return start * (1 - t) + end * t;
 };
@@ -198,6 +201,23 @@ export function IntermissionCanvas({ localStream, className }: IntermissionCanva
         return () => window.removeEventListener("resize", handleResize);
     }, []);
 
+    // 2.4 Video tier subscription: faces are small, the coffee chat partner is full size,
+    // and players that are hidden or well off screen aren't forwarded at all
+    useEffect(() => {
+        const tiers: Record<string, string> = {};
+        const halfW = viewport.width / 2 + OFFSCREEN_MARGIN;
+        const halfH = viewport.height / 2 + OFFSCREEN_MARGIN;
+        others.forEach(p => {
+            const shown = phase === "LOBBY" || p.hasSubmitted || p.isLeader;
+            const onScreen = !me || !viewport.width || (
+                Math.abs((p.x ?? 400) - (me.x ?? 400)) <= halfW && Math.abs((p.y ?? 300) - (me.y ?? 300)) <= halfH
+            );
+            if (!shown || !onScreen) tiers[p.id] = "off";
+        });
+        if (coffeePartnerId) tiers[coffeePartnerId] = "high";
+        socketClient.subscribeVideo("low", tiers);
+    }, [coffeePartnerId, others, me, viewport, phase]);
+
     // Helper to get my current visual position
     const myVisualPos = me && visualState[me.id] ? visualState[me.id] : { x: 400, y: 300 };
 
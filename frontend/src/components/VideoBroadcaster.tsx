@@ -5,6 +5,13 @@ interface VideoBroadcasterProps {
   stream: MediaStream | null;
 }
 
+// Simulcast tiers (must match backend/video.py). `every` = send on every Nth 66ms tick.
+const TIERS = [
+  { name: "high", size: 360, quality: 0.4, every: 1 },  // ~15 FPS, focused view
+  { name: "mid", size: 180, quality: 0.45, every: 2 },  // ~7.5 FPS, medium tiles
+  { name: "low", size: 120, quality: 0.5, every: 5 },   // ~3 FPS, avatar faces
+];
+
 export function VideoBroadcaster({ stream }: VideoBroadcasterProps) {
   const canvasRef = useRef<HTMLCanvasElement>(null);
 
@@ -20,8 +27,22 @@ export function VideoBroadcaster({ stream }: VideoBroadcasterProps) {
     const ctx = canvasRef.current.getContext("2d");
     if (!ctx) return;
 
-    // Throttle to 10 FPS (100ms)
+    // Tiers someone in the room is subscribed to (server sends "video_demand")
+    let demand = new Set(TIERS.map(t => t.name));
+    const handleDemand = (e: CustomEvent) => {
+      if (e.detail?.type === "video_demand") demand = new Set(e.detail.tiers);
+    };
+    window.addEventListener("game_socket_message" as any, handleDemand);
+
+    // Scratch canvases for the smaller tiers
+    const scaled: Record<string, HTMLCanvasElement> = {};
+    let tick = 0;
+
     const interval = setInterval(() => {
+      tick++;
+      const due = TIERS.filter(t => tick % t.every === 0 && demand.has(t.name));
+      if (due.length === 0) return;
+
       if (video.readyState === video.HAVE_ENOUGH_DATA) {
         // Center crop to square (1:1)
         const size = 360; // Increased from 140 for better quality (approx 360p square)
@@ -47,11 +68,18 @@ export function VideoBroadcaster({ stream }: VideoBroadcasterProps) {
 
         ctx.drawImage(video, sx, sy, sWidth, sHeight, 0, 0, size, size);
 
-        // Compress to JPEG 0.4 (Better visibility, still compressed)
-        const frame = canvasRef.current.toDataURL("image/jpeg", 0.4);
-        socketClient.sendVideoFrame(frame);
+        for (const tier of due) {
+          let canvas = canvasRef.current;
+          if (tier.size !== size) {
+            canvas = scaled[tier.name] ??= Object.assign(document.createElement("canvas"), { width: tier.size, height: tier.size });
+            canvas.getContext("2d")?.drawImage(canvasRef.current, 0, 0, tier.size, tier.size);
+          }
+          // Compress to JPEG (lower tiers tolerate slightly higher quality at a fraction of the bytes)
+          const frame = canvas.toDataURL("image/jpeg", tier.quality);
+          socketClient.sendVideoFrame(frame, tier.name);
+        }
       }
-    }, 66); // ~15 FPS
+    }, 66); // ~15 FPS base tick
 
     // outputting "The play() request was interrupted by a call to pause()"
     // We can just clear srcObject and let GC handle it, or check promise.
@@ -59,6 +87,7 @@ export function VideoBroadcaster({ stream }: VideoBroadcasterProps) {
     // just nullify srcObject which stops stream usage.
     return () => {
       clearInterval(interval);
+      window.removeEventListener("game_socket_message" as any, handleDemand);
       video.srcObject = null;
       // video.pause(); // REMOVED to prevent AbortError if play() is pending
     };
@@ -28,6 +28,16 @@ class GameSocket {
   private reconnectTimeout: NodeJS.Timeout | null = null;
   private messageQueue: string[] = [];
 
+  // Session resume: token from "welcome", highest reliable message seq seen
+  private resumeToken: string | null = null;
+  private lastSeq = 0;
+  // Delay before the next reconnect (set when the server moves us to another process)
+  private nextReconnectDelay: number | null = null;
+  private lastJoin: string | null = null;
+  // Settings the server keeps per socket (audio codec, video subscriptions): re-sent on every
+  // (re)connect, so a reconnect, resume or migration doesn't fall back to server defaults
+  private connectionSettings = new Map<string, string>();
+
   connect() {
     if (this.socket && (this.socket.readyState === WebSocket.OPEN || this.socket.readyState === WebSocket.CONNECTING)) {
       return;
@@ -39,6 +49,11 @@ class GameSocket {
     this.socket.onopen = () => {
       console.log("WS Connected");
       if (this.reconnectTimeout) clearTimeout(this.reconnectTimeout);
+      // Reclaim our seat (score, position) before anything else is sent
+      if (this.resumeToken) {
+        this.socket?.send(JSON.stringify({ type: "resume", token: this.resumeToken, last_seq: this.lastSeq }));
+      }
+      this.connectionSettings.forEach((msg) => this.socket?.send(msg));
       this.flushQueue();
     };
 
@@ -47,6 +62,36 @@ class GameSocket {
         const data = JSON.parse(event.data);
         const { debugLogState, handleServerMessage } = useGameStore.getState();
 
+        if (data.type === "welcome") {
+          // New seat: seq numbering starts over
+          this.resumeToken = data.resume_token ?? null;
+          this.lastSeq = data.seq ?? 0;
+        } else if (typeof data.seq === "number") {
+          if (data.seq <= this.lastSeq) return; // Already seen (replayed)
+          this.lastSeq = data.seq;
+        }
+        if (data.type === "resumed") {
+          this.resumeToken = data.resume_token ?? null;
+        } else if (data.type === "migrate") {
+          // Room moved to another server process: reconnect there and resume our seat
+          this.moveTo(data.url, data.reconnect_delay_ms ?? 0);
+          if (data.resume_token) this.resumeToken = data.resume_token;
+          return;
+        } else if (data.type === "server_draining") {
+          // Server is shutting down and takes no new rooms: join again on the new one
+          if (this.lastJoin) this.messageQueue.push(this.lastJoin);
+          this.moveTo(data.url, 0);
+          return;
+        } else if (data.type === "room_closed") {
+          this.connectionSettings.delete("spectate");
+        } else if (data.type === "resume_failed") {
+          // Seat expired: join again from scratch
+          this.resumeToken = null;
+          this.lastSeq = 0;
+          const { me } = useGameStore.getState();
+          if (me) this.join(me.name);
+        }
+
         if (debugLogState) {
           console.log("[WS IN]", data);
         }
@@ -64,7 +109,9 @@ class GameSocket {
       console.log("WS Closed");
       this.socket = null;
       // Auto reconnect
-      this.reconnectTimeout = setTimeout(() => this.connect(), 2000);
+      const delay = this.nextReconnectDelay ?? 2000;
+      this.nextReconnectDelay = null;
+      this.reconnectTimeout = setTimeout(() => this.connect(), delay);
     };
 
     this.socket.onerror = (err) => {
@@ -73,6 +120,12 @@ class GameSocket {
     };
   }
 
+  private moveTo(url: string, delayMs: number) {
+    this.url = url;
+    this.nextReconnectDelay = delayMs;
+    this.socket?.close();
+  }
+
   private flushQueue() {
     if (!this.socket || this.socket.readyState !== WebSocket.OPEN) return;
     while (this.messageQueue.length > 0) {
@@ -98,11 +151,43 @@ class GameSocket {
     }
   }
 
+  // Like send, but remembered and replayed on every new connection (latest value per type)
+  private sendSetting(type: string, payload: any) {
+    const msg = JSON.stringify({ type, ...payload });
+    const unchanged = this.connectionSettings.get(type) === msg;
+    this.connectionSettings.set(type, msg);
+    if (!unchanged && this.socket && this.socket.readyState === WebSocket.OPEN) {
+      this.send(type, payload);
+    }
+  }
+
+  // Offer audio codecs in preference order; the server answers with "audio_codec"
+  offerAudioCodecs(codecs: string[], sampleRate: number) {
+    this.sendSetting("audio_codec", { codecs, sample_rate: sampleRate });
+  }
+
   join(username: string) {
     const { roomCode } = useGameStore.getState();
+    this.connectionSettings.delete("spectate"); // Taking a seat ends spectating
+    this.lastJoin = JSON.stringify({ type: "join", username, room_code: roomCode });
     this.send("join", { username, room_code: roomCode });
   }
 
+  // Watch a room without playing (no seat, reduced-rate shared stream)
+  spectate(roomCode: string) {
+    // A setting, so a migrate to another server process spectates the room there again
+    this.sendSetting("spectate", { room_code: roomCode });
+  }
+
+  // Solo queue: the server answers with "match_found" and a room code to join
+  joinQueue(username: string, questionType: string = "any") {
+    this.send("queue_join", { username, question_type: questionType });
+  }
+
+  leaveQueue() {
+    this.send("queue_leave", {});
+  }
+
   startGame() {
     this.send("start_game", {});
   }
@@ -112,13 +197,18 @@ class GameSocket {
     this.send("submit", { content });
   }
 
-  sendVideoFrame(frame: string) {
+  sendVideoFrame(frame: string, tier: string = "high") {
     if (this.socket && this.socket.readyState === WebSocket.OPEN) {
       // Bypass debug log for video frames to avoid spam
-      this.socket.send(JSON.stringify({ type: "video_update", frame }));
+      this.socket.send(JSON.stringify({ type: "video_update", frame, tier }));
     }
   }
 
+  // Choose which simulcast tier (high / mid / low / off) to receive per player
+  subscribeVideo(defaultTier: string, players: Record<string, string> = {}) {
+    this.sendSetting("video_subscribe", { default: defaultTier, players });
+  }
+
   sendCoffeeInvite(targetId: string) {
     this.send("coffee_invite", { target_id: targetId });
   }
@@ -211,6 +211,21 @@ export const useGameStore = create<GameState>((set) => ({
             others: state.others.map(p => ({ ...p, hasSubmitted: false }))
           };
 
+        case "grading_score":
+          // Streamed grading: score arrives before the feedback text
+          if (state.me) {
+            return { me: { ...state.me, score: msg.score, feedback: [] } };
+          }
+          return {};
+
+        case "grading_feedback":
+          // msg.delta = next piece of feedback text
+          if (state.me) {
+            const soFar = (state.me.feedback || []).join("");
+            return { me: { ...state.me, feedback: [soFar + msg.delta] } };
+          }
+          return {};
+
         case "grading_complete":
           // msg.result = {score, feedback}
           if (state.me) {